@@ -33,6 +33,100 @@ WORDCLOUD_DIR = UPLOAD_DIR / "wordclouds"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 WORDCLOUD_DIR.mkdir(parents=True, exist_ok=True)
 
+# ============================================
+# ML INFERENCE SETTINGS
+# ============================================
+# Number of comments per forward pass in batch prediction
+ML_BATCH_SIZE = int(os.getenv("ML_BATCH_SIZE", "32"))
+# Max tokens per comment (PhoBERT supports up to 256)
+ML_MAX_LENGTH = int(os.getenv("ML_MAX_LENGTH", "256"))
+# Token budget per batch (rows x padded length), used by length bucketing
+ML_MAX_BATCH_TOKENS = int(os.getenv("ML_MAX_BATCH_TOKENS", "8192"))
+# Inference engine: "torch" (eager PyTorch) or "onnx" (ONNX Runtime CPU, exported once)
+ML_BACKEND = os.getenv("ML_BACKEND", "torch")
+# ONNX Runtime intra-op threads (0 = let ORT decide)
+ML_ONNX_THREADS = int(os.getenv("ML_ONNX_THREADS", "0"))
+# Dynamic int8 quantization of Linear layers for CPU inference
+ML_QUANTIZE = os.getenv("ML_QUANTIZE", "false").lower() in ("1", "true", "yes")
+# Local directory for derived model artifacts (e.g. the quantized model)
+ML_ARTIFACT_DIR = Path(os.getenv("ML_ARTIFACT_DIR", str(BASE_DIR / "app" / "services" / "Model" / "cache")))
+# Serve from an offline model bundle (python -m app.services.model_bundle build ...)
+# instead of the Hugging Face Hub; empty = use the Hub
+ML_BUNDLE_DIR = os.getenv("ML_BUNDLE_DIR", "")
+# Rust-backed PhoBERT tokenizer built from the bundled vocab.txt/bpe.codes
+# (falls back to the slow tokenizer if it does not match on a parity sample)
+ML_FAST_TOKENIZER = os.getenv("ML_FAST_TOKENIZER", "true").lower() in ("1", "true", "yes")
+# Build PhoBERT from config on the meta device and load the fine-tuned weights
+# directly, instead of first loading the pretrained vinai/phobert-base weights
+ML_FAST_LOAD = os.getenv("ML_FAST_LOAD", "true").lower() in ("1", "true", "yes")
+# Memory-map fine-tuned weights (converted once) so worker processes share pages
+ML_MMAP_WEIGHTS = os.getenv("ML_MMAP_WEIGHTS", "false").lower() in ("1", "true", "yes")
+# Load the model when the app module is imported, before a pre-fork server
+# (gunicorn --preload) forks its workers; workers then share it copy-on-write
+ML_PRELOAD_MODEL = os.getenv("ML_PRELOAD_MODEL", "false").lower() in ("1", "true", "yes")
+# Load and warm up the model in the background at startup (otherwise the first
+# /ready probe or request starts it)
+ML_EAGER_LOAD = os.getenv("ML_EAGER_LOAD", "false").lower() in ("1", "true", "yes")
+# Sequence lengths used for the dummy warm-up forward passes
+ML_WARMUP_LENGTHS = [int(n) for n in os.getenv("ML_WARMUP_LENGTHS", "16,64,256").split(",") if n.strip()]
+# Vietnamese word segmentation: memo size, process-pool workers for large
+# batches (0/1 = in-process; opt-in, each worker loads its own underthesea
+# model), and the minimum uncached texts to use the pool
+ML_SEGMENT_CACHE_SIZE = int(os.getenv("ML_SEGMENT_CACHE_SIZE", "50000"))
+ML_SEGMENT_WORKERS = int(os.getenv("ML_SEGMENT_WORKERS", "0"))
+ML_SEGMENT_PARALLEL_MIN = int(os.getenv("ML_SEGMENT_PARALLEL_MIN", "200"))
+# Optional JSON keyword lexicon {"positive": [...], "negative": [...]}
+# replacing the built-in lists used for highlighting and keyword stats
+ML_KEYWORD_LEXICON = os.getenv("ML_KEYWORD_LEXICON", "")
+# Explanations: "keywords" (lexicon heuristic, signed per word; same as batch
+# explanations and used on the onnx backend), "integrated_gradients" (signed
+# model attribution) or "attention" (rollout: relevance only, every word gets
+# the sign of the predicted sentiment). IG steps are cut to fit the
+# per-comment latency budget (0 = unbounded); results are cached per comment.
+ML_EXPLAIN_METHOD = os.getenv("ML_EXPLAIN_METHOD", "keywords")
+ML_EXPLAIN_IG_STEPS = int(os.getenv("ML_EXPLAIN_IG_STEPS", "16"))
+ML_EXPLAIN_BUDGET_MS = float(os.getenv("ML_EXPLAIN_BUDGET_MS", "1000"))
+ML_EXPLAIN_CACHE_SIZE = int(os.getenv("ML_EXPLAIN_CACHE_SIZE", "2000"))
+# Streaming CSV uploads: bytes per read, comments per inference chunk and
+# parsed chunks allowed to wait for inference
+ML_INGEST_READ_BYTES = int(os.getenv("ML_INGEST_READ_BYTES", "65536"))
+ML_INGEST_CHUNK_ROWS = int(os.getenv("ML_INGEST_CHUNK_ROWS", "512"))
+ML_INGEST_QUEUE_CHUNKS = int(os.getenv("ML_INGEST_QUEUE_CHUNKS", "4"))
+# Streaming batch endpoint: size of the first chunk (doubles up to
+# ML_INGEST_CHUNK_ROWS), so the first results arrive quickly
+ML_STREAM_FIRST_CHUNK_ROWS = int(os.getenv("ML_STREAM_FIRST_CHUNK_ROWS", "16"))
+# Asynchronous batch jobs (/api/predict/jobs): worker threads per process
+# (0 = this process only accepts jobs),
+# queue poll interval, and how long a running job may go without progress
+# before another worker takes it over (e.g. after a restart)
+ML_JOB_WORKERS = int(os.getenv("ML_JOB_WORKERS", "1"))
+ML_JOB_POLL_SECONDS = float(os.getenv("ML_JOB_POLL_SECONDS", "2"))
+ML_JOB_STALE_SECONDS = float(os.getenv("ML_JOB_STALE_SECONDS", "300"))
+# Uploads, result CSVs and PDFs of jobs (not under static/)
+ML_JOB_DIR = Path(os.getenv("ML_JOB_DIR", str(BASE_DIR / "app" / "database" / "batch_jobs")))
+# Batch history inserts: rows per INSERT/COPY statement, and COPY FROM STDIN
+# on PostgreSQL (psycopg2) instead of executemany
+ML_HISTORY_INSERT_CHUNK = int(os.getenv("ML_HISTORY_INSERT_CHUNK", "1000"))
+ML_HISTORY_COPY = os.getenv("ML_HISTORY_COPY", "true").lower() in ("1", "true", "yes")
+# Micro-batching of concurrent /api/predict/single requests
+ML_MICROBATCH_MAX_WAIT_MS = float(os.getenv("ML_MICROBATCH_MAX_WAIT_MS", "5"))
+ML_MICROBATCH_MAX_SIZE = int(os.getenv("ML_MICROBATCH_MAX_SIZE", "16"))
+# Dedicated inference thread pool (keeps the event loop free)
+ML_INFERENCE_WORKERS = int(os.getenv("ML_INFERENCE_WORKERS", "1"))
+# Max jobs waiting for a worker before requests get 503
+ML_INFERENCE_QUEUE_DEPTH = int(os.getenv("ML_INFERENCE_QUEUE_DEPTH", "32"))
+ML_INFERENCE_RETRY_AFTER = int(os.getenv("ML_INFERENCE_RETRY_AFTER", "5"))
+# In-memory prediction cache (0 entries disables it, TTL in seconds, 0 = no expiry)
+ML_CACHE_SIZE = int(os.getenv("ML_CACHE_SIZE", "10000"))
+ML_CACHE_TTL = float(os.getenv("ML_CACHE_TTL", "86400"))
+# Optional SQLite cache shared by all workers and kept across restarts
+ML_PERSISTENT_CACHE = os.getenv("ML_PERSISTENT_CACHE", "false").lower() in ("1", "true", "yes")
+ML_PERSISTENT_CACHE_PATH = Path(os.getenv(
+    "ML_PERSISTENT_CACHE_PATH",
+    str(BASE_DIR / "app" / "database" / "prediction_cache.db")
+))
+ML_PERSISTENT_CACHE_MAX_ENTRIES = int(os.getenv("ML_PERSISTENT_CACHE_MAX_ENTRIES", "500000"))
+
 # ============================================
 # PRODUCTION SETTINGS
 # ============================================
@@ -15,14 +15,23 @@ from pathlib import Path
 # 1. Use DATABASE_URL from environment (Render PostgreSQL)
 # 2. Fallback to SQLite for local development
 
+def normalize_database_url(url: str) -> str:
+    """
+    Name the psycopg2 driver (the one in requirements.txt) for PostgreSQL URLs.
+    Render provides URLs starting with 'postgres://', which SQLAlchemy 1.4+
+    rejects, and SQLAlchemy 2.1 maps a bare 'postgresql://' to psycopg 3.
+    """
+    for prefix in ("postgres://", "postgresql://"):
+        if url.startswith(prefix):
+            return "postgresql+psycopg2://" + url[len(prefix):]
+    return url
+
+
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 if DATABASE_URL:
-    # CRITICAL FIX FOR RENDER:
-    # Render provides URLs starting with 'postgres://'
-    # but SQLAlchemy 1.4+ requires 'postgresql://'
-    if DATABASE_URL.startswith("postgres://"):
-        DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+    # CRITICAL FIX FOR RENDER: see normalize_database_url
+    DATABASE_URL = normalize_database_url(DATABASE_URL)
     
     print(f"🚀 Production Mode: Using PostgreSQL")
     
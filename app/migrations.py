@@ -0,0 +1,89 @@
+"""
+Schema Migrations
+create_all() creates missing tables but never alters existing ones. The steps
+below bring databases created by earlier versions up to the current models.
+Each one checks the live schema first, so they run on every start (fresh
+databases are already current and nothing happens).
+
+Supports SQLite (tables that need a constraint change are rebuilt, as SQLite
+cannot alter columns in place) and PostgreSQL (ALTER TABLE).
+"""
+from sqlalchemy import inspect, text
+
+from app.database import engine
+from app.models import PredictionHistory
+
+# Batch rows leave these NULL and read them through prediction_batches
+HISTORY_NULLABLE_COLUMNS = ("user_id", "product_name")
+
+
+def _columns(inspector, table_name: str) -> dict:
+    return {column["name"]: column for column in inspector.get_columns(table_name)}
+
+
+def _add_batch_id(conn, table_name: str):
+    """Nullable batch_id with its foreign key (both dialects accept REFERENCES on ADD COLUMN)"""
+    conn.execute(text(
+        f"ALTER TABLE {table_name} ADD COLUMN batch_id INTEGER REFERENCES prediction_batches (id)"
+    ))
+    print(f"🔄 Added {table_name}.batch_id")
+
+
+def _create_indexes(conn, table):
+    for index in table.indexes:
+        index.create(bind=conn, checkfirst=True)
+
+
+def _rebuild_sqlite_table(conn, table, old_columns: dict):
+    """Recreate `table` from the model and copy the rows over (SQLite ALTER cannot relax NOT NULL)"""
+    old_name = f"{table.name}_old"
+    for index in inspect(conn).get_indexes(table.name):
+        conn.execute(text(f'DROP INDEX IF EXISTS "{index["name"]}"'))
+    conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {old_name}"))
+    table.create(bind=conn)
+    shared = ", ".join(column.name for column in table.columns if column.name in old_columns)
+    conn.execute(text(f"INSERT INTO {table.name} ({shared}) SELECT {shared} FROM {old_name}"))
+    conn.execute(text(f"DROP TABLE {old_name}"))
+    print(f"🔄 Rebuilt table {table.name} with the current schema")
+
+
+def migrate_prediction_history(conn):
+    """batch_id (foreign key + index) and nullable user_id/product_name"""
+    inspector = inspect(conn)
+    table = PredictionHistory.__table__
+    if not inspector.has_table(table.name):
+        return
+    columns = _columns(inspector, table.name)
+    missing_batch_id = "batch_id" not in columns
+    not_null = [name for name in HISTORY_NULLABLE_COLUMNS if not columns[name]["nullable"]]
+    if not missing_batch_id and not not_null:
+        _create_indexes(conn, table)
+        return
+
+    if conn.dialect.name == "sqlite":
+        _rebuild_sqlite_table(conn, table, columns)
+        return
+
+    if missing_batch_id:
+        _add_batch_id(conn, table.name)
+    for name in not_null:
+        conn.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN {name} DROP NOT NULL"))
+        print(f"🔄 {table.name}.{name} is now nullable")
+    _create_indexes(conn, table)
+
+
+def migrate_batch_jobs(conn):
+    """batch_id linking a job to the prediction batch it writes"""
+    inspector = inspect(conn)
+    if inspector.has_table("batch_jobs") and "batch_id" not in _columns(inspector, "batch_jobs"):
+        _add_batch_id(conn, "batch_jobs")
+
+
+MIGRATIONS = (migrate_prediction_history, migrate_batch_jobs)
+
+
+def run_migrations(bind=engine):
+    """Apply every migration in one transaction (call after create_all)"""
+    with bind.begin() as conn:
+        for migration in MIGRATIONS:
+            migration(conn)
@@ -18,6 +18,7 @@ class User(Base):
     
     # Relationship
     predictions = relationship("PredictionHistory", back_populates="user")
+    batches = relationship("PredictionBatch", back_populates="user")
     
     def __repr__(self):
         return f"<User {self.username}>"
@@ -28,16 +29,67 @@ class PredictionHistory(Base):
     __tablename__ = "prediction_history"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    product_name = Column(String(200), nullable=False)
+    # Batch rows leave user_id, product_name and prediction_type NULL and
+    # read them through `batch` (rows saved before batches existed keep them)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    product_name = Column(String(200), nullable=True)
     comment = Column(Text, nullable=False)
     predicted_rating = Column(Integer, nullable=False)
     confidence_score = Column(Float, nullable=True)
-    prediction_type = Column(String(20), default="single")  # 'single' or 'batch'
+    prediction_type = Column(String(20), default="single")  # 'single' (legacy: 'batch')
+    batch_id = Column(Integer, ForeignKey("prediction_batches.id"), nullable=True, index=True)  # NULL for single
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationship
     user = relationship("User", back_populates="predictions")
+    batch = relationship("PredictionBatch", back_populates="predictions")
     
     def __repr__(self):
         return f"<PredictionHistory {self.id}: {self.predicted_rating}⭐>"
+
+
+class PredictionBatch(Base):
+    """One uploaded CSV; its rows are the prediction_history rows with this batch_id"""
+    __tablename__ = "prediction_batches"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    product_name = Column(String(200), nullable=False)
+    filename = Column(String(255), nullable=True)
+    source = Column(String(20), default="batch")  # 'batch', 'stream' or 'job'
+    row_count = Column(Integer, default=0)
+    average_rating = Column(Float, nullable=True)
+    average_confidence = Column(Float, nullable=True)
+    rating_distribution = Column(Text, nullable=True)  # JSON: {rating: count}
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationship
+    user = relationship("User", back_populates="batches")
+    predictions = relationship("PredictionHistory", back_populates="batch")
+    
+    def __repr__(self):
+        return f"<PredictionBatch {self.id}: {self.product_name} ({self.row_count} rows)>"
+
+
+class BatchJob(Base):
+    """Asynchronous CSV batch prediction job (state survives restarts)"""
+    __tablename__ = "batch_jobs"
+    
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    product_name = Column(String(200), nullable=False)
+    filename = Column(String(255), nullable=True)
+    batch_id = Column(Integer, ForeignKey("prediction_batches.id"), nullable=True)  # set when the job starts
+    status = Column(String(20), default="queued", index=True)  # queued, running, completed, failed
+    total_rows = Column(Integer, nullable=True)  # known once the upload is scanned
+    rows_done = Column(Integer, default=0)
+    rows_per_second = Column(Float, nullable=True)
+    summary = Column(Text, nullable=True)  # JSON: distribution, n-grams, keywords, wordcloud
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)  # heartbeat while running
+    finished_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<BatchJob {self.id}: {self.status} {self.rows_done}/{self.total_rows}>"
@@ -7,49 +7,114 @@ Handles single and batch predictions with enhanced features:
 """
 import io
 import csv
-from typing import List, Dict
+import html
+import json
+import time
+import tempfile
+from typing import List, Dict, Optional
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, FileResponse
 from sqlalchemy.orm import Session
 
-from app.database import get_db
-from app.models import User, PredictionHistory
+from app.config import (
+    ML_INGEST_CHUNK_ROWS,
+    ML_INGEST_QUEUE_CHUNKS,
+    ML_INGEST_READ_BYTES,
+    ML_STREAM_FIRST_CHUNK_ROWS
+)
+from app.database import get_db, SessionLocal
+from app.models import User, PredictionHistory, PredictionBatch, BatchJob
 from app.schemas import (
     SinglePredictionRequest,
     SinglePredictionResponse,
     BatchPredictionResponse,
+    BatchJobResponse,
     PredictionHistoryResponse,
+    PredictionBatchResponse,
     PDFReportRequest,
     NgramAnalysisRequest,
     NgramAnalysisResponse
 )
 from app.services.auth_service import get_current_user
-from app.services.ml_service import get_ml_service, MLPredictionService
+from app.services.ml_service import (
+    get_ml_service,
+    MLPredictionService,
+    ModelLoadError,
+    KeywordAnalyzer,
+    KeywordAutomaton
+)
+from app.services.micro_batcher import get_micro_batcher, PredictionMicroBatcher
+from app.services.inference_executor import get_inference_executor, InferenceExecutor
+from app.services.csv_stream import iter_comment_batches, CSVFormatError
+from app.services.batch_jobs import get_batch_job_manager, BatchJobManager
+from app.services.history_service import (
+    save_batch_history,
+    create_batch,
+    finish_batch,
+    batch_distribution,
+    delete_batch,
+    history_record,
+    user_history
+)
 from app.services.visualization_service import get_viz_service, VisualizationService
 from app.services.report_service import get_report_service, ReportService
 
 router = APIRouter()
 
 
-def highlight_text(text: str, positive_keywords: List[str], negative_keywords: List[str]) -> str:
-    """Apply HTML highlighting to keywords in text"""
-    highlighted = text
-    
-    # Sort by length (longer first) to avoid partial matches
-    for word in sorted(negative_keywords, key=len, reverse=True):
-        highlighted = highlighted.replace(
-            word, 
-            f'<span class="highlight-negative">{word}</span>'
-        )
+def select_highlight_spans(matches: List[Dict]) -> List[Dict]:
+    """
+    Reduce keyword matches to non-overlapping spans, scanning left to right;
+    where matches overlap, the one starting first wins and, for the same
+    start, the longest ("rất tệ" over "tệ", "tuyệt vời" over "tuyệt").
+    """
+    selected = []
+    covered_until = 0
+    for match in sorted(matches, key=lambda m: (m['start'], -m['end'])):
+        if match['start'] >= covered_until:
+            selected.append(match)
+            covered_until = match['end']
+    return selected
+
+
+def highlight_text(
+    text: str,
+    positive_keywords: List[str],
+    negative_keywords: List[str],
+    spans: Optional[List[Dict]] = None
+) -> str:
+    """
+    Apply HTML highlighting to keywords in text.
+
+    Built in one pass from match spans ({'start', 'end', 'polarity'} as
+    returned by KeywordAnalyzer.find_matches); when spans are not given they
+    are found for the keyword lists. The comment itself is HTML-escaped.
+    """
+    if spans is None:
+        keywords = positive_keywords + negative_keywords
+        automaton = KeywordAutomaton([word.lower() for word in keywords])
+        spans = [
+            {
+                'start': start,
+                'end': end,
+                'polarity': 'positive' if index < len(positive_keywords) else 'negative'
+            }
+            for start, end, index in automaton.find_all(KeywordAnalyzer._lower(text))
+        ]
     
-    for word in sorted(positive_keywords, key=len, reverse=True):
-        highlighted = highlighted.replace(
-            word, 
-            f'<span class="highlight-positive">{word}</span>'
+    parts = []
+    position = 0
+    for span in select_highlight_spans(spans):
+        parts.append(html.escape(text[position:span['start']]))
+        parts.append(
+            f'<span class="highlight-{span["polarity"]}">'
+            f'{html.escape(text[span["start"]:span["end"]])}</span>'
         )
+        position = span['end']
+    parts.append(html.escape(text[position:]))
     
-    return highlighted
+    return ''.join(parts)
 
 
 @router.post("/single", response_model=SinglePredictionResponse)
@@ -57,7 +122,9 @@ async def predict_single(
     request: SinglePredictionRequest,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
-    ml_service: MLPredictionService = Depends(get_ml_service)
+    ml_service: MLPredictionService = Depends(get_ml_service),
+    micro_batcher: PredictionMicroBatcher = Depends(get_micro_batcher),
+    executor: InferenceExecutor = Depends(get_inference_executor)
 ):
     """
     Predict rating for a single comment with optional explanation
@@ -69,10 +136,13 @@ async def predict_single(
     Returns predicted rating (1-5 stars) with confidence score,
     keyword highlighting, and optionally word importance explanation
     """
+    # One keyword scan serves the keyword lists and the highlighting spans
+    matches = ml_service.keyword_analyzer.find_matches(request.comment)
+    
     # Check if explanation is requested
     if request.include_explanation:
         # Use enhanced prediction with explanation
-        result = ml_service.predict_with_explanation(request.comment)
+        result = await executor.run(ml_service.predict_with_explanation, request.comment, matches)
         prediction = {
             'rating': result['rating'],
             'confidence': result['confidence']
@@ -80,23 +150,23 @@ async def predict_single(
         explanation = result.get('explanation')
         keywords = result.get('keywords')
     else:
-        # Use standard prediction
-        prediction = ml_service.predict_single(request.comment)
-        # Still get keyword analysis for highlighting
-        keywords = ml_service.keyword_analyzer.analyze(request.comment)
+        # Use standard prediction (batched with concurrent requests)
+        prediction = await micro_batcher.predict(request.comment)
+        keywords = ml_service.keyword_analyzer.analyze(request.comment, matches)
         explanation = None
     
     # Generate highlighted text
     highlighted_comment = highlight_text(
         request.comment,
-        keywords.get('positive_keywords', []) if isinstance(keywords, dict) else keywords.positive_keywords if keywords else [],
-        keywords.get('negative_keywords', []) if isinstance(keywords, dict) else keywords.negative_keywords if keywords else []
+        keywords['positive_keywords'],
+        keywords['negative_keywords'],
+        spans=matches
     )
     
     # Save to history
     history = PredictionHistory(
         user_id=current_user.id,
-        product_name=request.product_name,
+        product_name=request.product_name or "Unknown Product",
         comment=request.comment,
         predicted_rating=prediction['rating'],
         confidence_score=prediction['confidence'],
@@ -118,10 +188,12 @@ async def predict_single(
 @router.post("/batch", response_model=BatchPredictionResponse)
 async def predict_batch(
     product_name: str = Form(None),
+    include_explanation: bool = Form(False),
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
     ml_service: MLPredictionService = Depends(get_ml_service),
+    executor: InferenceExecutor = Depends(get_inference_executor),
     viz_service: VisualizationService = Depends(get_viz_service),
     report_service: ReportService = Depends(get_report_service)
 ):
@@ -129,12 +201,14 @@ async def predict_batch(
     Predict ratings for batch of comments from CSV file with enhanced analysis
     
     - **product_name**: Name of the product
+    - **include_explanation**: Whether to include word importance for every comment
     - **file**: CSV file with 'Comment' column
     
     Returns predictions with:
     - Visualization data (wordcloud, distribution chart)
     - N-gram analysis (unigrams, bigrams, trigrams)
     - Keyword frequency analysis
+    - Explanations aligned with results (if requested)
     """
     # Validate file type
     if not file.filename.endswith('.csv'):
@@ -144,54 +218,35 @@ async def predict_batch(
         )
     
     try:
-        # Read CSV file
-        contents = await file.read()
-        csv_file = io.StringIO(contents.decode('utf-8'))
-        reader = csv.DictReader(csv_file)
-        
-        # Check for Comment column
-        if 'Comment' not in reader.fieldnames:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="CSV must contain 'Comment' column"
-            )
-        
-        # Extract comments
-        comments = []
-        for row in reader:
-            if row.get('Comment', '').strip():
-                comments.append(row['Comment'].strip())
+        # Parse the upload incrementally; each chunk of comments is predicted
+        # while the next one is being read
+        analysis = ml_service.new_batch_analysis()
+        predictions = []
+        async for chunk in iter_comment_batches(file, ML_INGEST_CHUNK_ROWS, ML_INGEST_QUEUE_CHUNKS):
+            predictions.extend(await executor.run(
+                ml_service.predict_batch_chunk, chunk, analysis, include_explanation
+            ))
         
-        if not comments:
+        if not predictions:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No valid comments found in CSV"
             )
         
-        # Make batch predictions with analysis
-        batch_result = ml_service.predict_batch_with_analysis(comments)
-        predictions = batch_result['predictions']
-        ngrams = batch_result['ngrams']
-        keyword_frequency = batch_result['keyword_frequency']
+        comments = [pred['text'] for pred in predictions]
+        ngrams = analysis.ngrams
+        keyword_frequency = analysis.keyword_frequency
 
         final_product_name = product_name if product_name else "Unknown Product"
 
-        # Save to history
-        for pred in predictions:
-            history = PredictionHistory(
-                user_id=current_user.id,
-                product_name=final_product_name,
-                comment=pred['text'],
-                predicted_rating=pred['rating'],
-                confidence_score=pred['confidence'],
-                prediction_type='batch'
-            )
-            db.add(history)
+        # Save to history (bulk insert) under one batch row
+        batch = create_batch(db, current_user.id, final_product_name, file.filename)
+        save_batch_history(db, batch.id, predictions)
+        finish_batch(batch, analysis)
         db.commit()
         
         # Calculate rating distribution
-        ratings = [p['rating'] for p in predictions]
-        distribution = viz_service.calculate_rating_distribution(ratings)
+        distribution = viz_service.calculate_rating_distribution(analysis.ratings)
         
         # Generate word cloud
         wordcloud_filename = f"wordcloud_{current_user.username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
@@ -224,9 +279,19 @@ async def predict_batch(
             "csv_download_url": f"/api/predict/download/{current_user.id}/{datetime.now().timestamp()}",
             "pdf_download_url": f"/api/predict/download-pdf/{current_user.id}/{datetime.now().timestamp()}",
             "ngrams": ngrams,
-            "keyword_frequency": keyword_frequency
+            "keyword_frequency": keyword_frequency,
+            "inference_stats": analysis.inference_stats,
+            "explanations": [pred['explanation'] for pred in predictions] if include_explanation else None,
+            "batch_id": batch.id
         }
     
+    except (HTTPException, ModelLoadError):
+        raise
+    except CSVFormatError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -234,6 +299,309 @@ async def predict_batch(
         )
 
 
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+
+def _stream_record(event: str, data: dict, fmt: str) -> str:
+    """One NDJSON line or SSE event"""
+    if fmt == "sse":
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    return json.dumps({"event": event, **data}, ensure_ascii=False) + "\n"
+
+
+@router.post("/batch/stream")
+async def predict_batch_stream(
+    product_name: str = Form(None),
+    format: str = Form("ndjson"),
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    ml_service: MLPredictionService = Depends(get_ml_service),
+    executor: InferenceExecutor = Depends(get_inference_executor)
+):
+    """
+    Stream batch predictions as they are computed
+    
+    - **product_name**: Name of the product
+    - **format**: "ndjson" (default) or "sse"
+    - **file**: CSV file with 'Comment' column
+    
+    Emits one "predictions" record per chunk ({"rows": [{index, rating,
+    confidence}, ...]}, index = position among the non-empty comments),
+    then a "summary" record with the batch id, rating distribution, n-grams
+    and keyword frequency, or an "error" record if processing stops.
+    """
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File must be a CSV"
+        )
+    if format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format must be 'ndjson' or 'sse'"
+        )
+    
+    # The upload is closed once this handler returns, so the stream reads
+    # from its own temporary copy
+    upload = tempfile.TemporaryFile()
+    while True:
+        chunk = await file.read(ML_INGEST_READ_BYTES)
+        if not chunk:
+            break
+        upload.write(chunk)
+    upload.seek(0)
+    
+    batches = iter_comment_batches(
+        upload,
+        ML_INGEST_CHUNK_ROWS,
+        ML_INGEST_QUEUE_CHUNKS,
+        first_batch_size=ML_STREAM_FIRST_CHUNK_ROWS
+    )
+    # Parse up to the first chunk now so format errors are still a 400
+    try:
+        first_chunk = await batches.__anext__()
+    except (CSVFormatError, StopAsyncIteration) as e:
+        await batches.aclose()
+        upload.close()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e) if isinstance(e, CSVFormatError) else "No valid comments found in CSV"
+        )
+    
+    final_product_name = product_name if product_name else "Unknown Product"
+    user_id = current_user.id
+    filename = file.filename
+    
+    async def generate():
+        started = time.perf_counter()
+        analysis = ml_service.new_batch_analysis()
+        db = SessionLocal()
+        batch = None
+        finished = False
+        index = 0
+        try:
+            batch = create_batch(db, user_id, final_product_name, filename, source="stream")
+            db.commit()
+            chunk = first_chunk
+            while True:
+                predictions = await executor.run(ml_service.predict_batch_chunk, chunk, analysis)
+                
+                save_batch_history(db, batch.id, predictions)
+                db.commit()
+                
+                rows = [
+                    {'index': index + i, 'rating': pred['rating'], 'confidence': pred['confidence']}
+                    for i, pred in enumerate(predictions)
+                ]
+                index += len(predictions)
+                yield _stream_record("predictions", {"rows": rows}, format)
+                
+                try:
+                    chunk = await batches.__anext__()
+                except StopAsyncIteration:
+                    break
+            
+            finish_batch(batch, analysis)
+            db.commit()
+            finished = True
+            yield _stream_record("summary", {
+                "batch_id": batch.id,
+                "total_predictions": analysis.total,
+                "rating_distribution": analysis.rating_distribution,
+                "ngrams": analysis.ngrams,
+                "keyword_frequency": analysis.keyword_frequency,
+                "inference_stats": analysis.inference_stats,
+                "elapsed_seconds": round(time.perf_counter() - started, 3)
+            }, format)
+        except Exception as e:
+            db.rollback()
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            yield _stream_record("error", {"detail": detail, "rows_done": index}, format)
+        finally:
+            # Stopped early (error, or the client went away): keep the
+            # committed rows countable, with stats of what was predicted
+            if not finished and batch is not None and batch.id is not None:
+                try:
+                    db.rollback()
+                    finish_batch(batch, analysis)
+                    batch.row_count = index
+                    db.commit()
+                except Exception as e:
+                    print(f"⚠️ Could not finalize stream batch {batch.id}: {e}")
+            db.close()
+            await batches.aclose()
+            upload.close()
+    
+    return StreamingResponse(
+        generate(),
+        media_type=STREAM_MEDIA_TYPES[format],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _job_response(job: BatchJob) -> dict:
+    """Job status with progress, ETA and (when finished) download links"""
+    eta_seconds = None
+    if job.status == "running" and job.rows_per_second and job.total_rows is not None:
+        eta_seconds = round(max(job.total_rows - job.rows_done, 0) / job.rows_per_second, 1)
+    
+    base_url = f"/api/predict/jobs/{job.id}"
+    completed = job.status == "completed"
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "product_name": job.product_name,
+        "filename": job.filename,
+        "batch_id": job.batch_id,
+        "total_rows": job.total_rows,
+        "rows_done": job.rows_done or 0,
+        "rows_per_second": job.rows_per_second,
+        "eta_seconds": eta_seconds,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "status_url": base_url,
+        "result_url": f"{base_url}/result" if completed else None,
+        "csv_download_url": f"{base_url}/csv" if completed else None,
+        "pdf_download_url": f"{base_url}/pdf" if completed else None
+    }
+
+
+def _get_user_job(job_id: str, current_user: User, db: Session) -> BatchJob:
+    job = db.query(BatchJob).filter(
+        BatchJob.id == job_id,
+        BatchJob.user_id == current_user.id
+    ).first()
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Batch job not found"
+        )
+    return job
+
+
+def _require_completed(job: BatchJob):
+    if job.status != "completed":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Batch job is {job.status}" + (f": {job.error}" if job.error else "")
+        )
+
+
+@router.post("/jobs", response_model=BatchJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_batch_job(
+    product_name: str = Form(None),
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    job_manager: BatchJobManager = Depends(get_batch_job_manager)
+):
+    """
+    Queue a CSV batch prediction and return immediately
+    
+    - **product_name**: Name of the product
+    - **file**: CSV file with 'Comment' column
+    
+    Poll **status_url** for progress; results, CSV and PDF are available
+    once the job is completed.
+    """
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File must be a CSV"
+        )
+    
+    job_id = job_manager.new_job_id()
+    await job_manager.save_upload(job_id, file)
+    job = job_manager.create_job(
+        db,
+        job_id,
+        current_user.id,
+        product_name if product_name else "Unknown Product",
+        file.filename
+    )
+    return _job_response(job)
+
+
+@router.get("/jobs/{job_id}", response_model=BatchJobResponse)
+async def get_batch_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Progress of a batch job (rows done, rows/sec, ETA)"""
+    return _job_response(_get_user_job(job_id, current_user, db))
+
+
+@router.get("/jobs/{job_id}/result", response_model=BatchPredictionResponse)
+async def get_batch_job_result(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    job_manager: BatchJobManager = Depends(get_batch_job_manager)
+):
+    """Full results of a completed batch job (same shape as /batch)"""
+    job = _get_user_job(job_id, current_user, db)
+    _require_completed(job)
+    
+    summary = json.loads(job.summary)
+    predictions = job_manager.read_results(job.id)
+    return {
+        "total_predictions": len(predictions),
+        "rating_distribution": summary['rating_distribution'],
+        "wordcloud_url": summary['wordcloud_url'],
+        "results": [
+            {
+                'Comment': pred['text'],
+                'Predicted_Rating': pred['rating'],
+                'Confidence': pred['confidence']
+            }
+            for pred in predictions
+        ],
+        "csv_download_url": f"/api/predict/jobs/{job.id}/csv",
+        "pdf_download_url": f"/api/predict/jobs/{job.id}/pdf",
+        "ngrams": summary['ngrams'],
+        "keyword_frequency": summary['keyword_frequency'],
+        "inference_stats": summary.get('inference_stats'),
+        "batch_id": job.batch_id
+    }
+
+
+@router.get("/jobs/{job_id}/csv")
+async def download_batch_job_csv(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    job_manager: BatchJobManager = Depends(get_batch_job_manager)
+):
+    """Download the results of a completed batch job as CSV"""
+    job = _get_user_job(job_id, current_user, db)
+    _require_completed(job)
+    return FileResponse(
+        job_manager.results_path(job.id),
+        media_type="text/csv",
+        filename=f"predictions_{job.id}.csv"
+    )
+
+
+@router.get("/jobs/{job_id}/pdf")
+async def download_batch_job_pdf(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    job_manager: BatchJobManager = Depends(get_batch_job_manager)
+):
+    """Download the PDF report of a completed batch job"""
+    job = _get_user_job(job_id, current_user, db)
+    _require_completed(job)
+    return FileResponse(
+        job_manager.pdf_path(job.id),
+        media_type="application/pdf",
+        filename=f"predictions_report_{job.id}.pdf"
+    )
+
+
 @router.get("/history", response_model=List[PredictionHistoryResponse])
 async def get_prediction_history(
     limit: int = 50,
@@ -245,11 +613,161 @@ async def get_prediction_history(
     
     - **limit**: Maximum number of records to return (default: 50)
     """
-    history = db.query(PredictionHistory).filter(
-        PredictionHistory.user_id == current_user.id
-    ).order_by(PredictionHistory.created_at.desc()).limit(limit).all()
+    return user_history(db, current_user.id, limit)
+
+
+def _batch_response(batch: PredictionBatch) -> dict:
+    base_url = f"/api/predict/batches/{batch.id}"
+    return {
+        "batch_id": batch.id,
+        "product_name": batch.product_name,
+        "filename": batch.filename,
+        "source": batch.source,
+        "row_count": batch.row_count or 0,
+        "average_rating": batch.average_rating,
+        "average_confidence": batch.average_confidence,
+        "rating_distribution": batch_distribution(batch),
+        "created_at": batch.created_at,
+        "predictions_url": f"{base_url}/predictions",
+        "pdf_download_url": f"{base_url}/pdf"
+    }
+
+
+def _get_user_batch(batch_id: int, current_user: User, db: Session) -> PredictionBatch:
+    batch = db.query(PredictionBatch).filter(
+        PredictionBatch.id == batch_id,
+        PredictionBatch.user_id == current_user.id
+    ).first()
+    if batch is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Batch not found"
+        )
+    return batch
+
+
+@router.get("/batches", response_model=List[PredictionBatchResponse])
+async def list_prediction_batches(
+    limit: int = 50,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Batch uploads of the current user, newest first
+    
+    - **limit**: Maximum number of batches to return (default: 50)
+    """
+    batches = db.query(PredictionBatch).filter(
+        PredictionBatch.user_id == current_user.id
+    ).order_by(PredictionBatch.created_at.desc()).limit(limit).all()
+    
+    return [_batch_response(batch) for batch in batches]
+
+
+@router.get("/batches/{batch_id}", response_model=PredictionBatchResponse)
+async def get_prediction_batch(
+    batch_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Summary of one batch upload (row count, averages, rating distribution)"""
+    return _batch_response(_get_user_batch(batch_id, current_user, db))
+
+
+@router.get("/batches/{batch_id}/predictions", response_model=List[PredictionHistoryResponse])
+async def get_prediction_batch_rows(
+    batch_id: int,
+    limit: int = 100,
+    offset: int = 0,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    History rows of one batch, in upload order
+    
+    - **limit**: Maximum number of rows to return (default: 100)
+    - **offset**: Number of rows to skip
+    """
+    batch = _get_user_batch(batch_id, current_user, db)
+    rows = db.query(PredictionHistory).filter(
+        PredictionHistory.batch_id == batch.id
+    ).order_by(PredictionHistory.id).offset(offset).limit(limit).all()
+    return [history_record(row) for row in rows]
+
+
+@router.get("/batches/{batch_id}/pdf")
+async def download_prediction_batch_pdf(
+    batch_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    viz_service: VisualizationService = Depends(get_viz_service),
+    report_service: ReportService = Depends(get_report_service)
+):
+    """Regenerate the PDF report of a batch from its stored predictions"""
+    batch = _get_user_batch(batch_id, current_user, db)
+    rows = db.query(
+        PredictionHistory.comment,
+        PredictionHistory.predicted_rating,
+        PredictionHistory.confidence_score
+    ).filter(
+        PredictionHistory.batch_id == batch.id
+    ).order_by(PredictionHistory.id).all()
+    if not rows:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Batch has no predictions"
+        )
+    
+    try:
+        predictions = [
+            {'text': comment, 'rating': rating, 'confidence': confidence or 0.0}
+            for comment, rating, confidence in rows
+        ]
+        wordcloud_url = viz_service.generate_wordcloud(
+            [pred['text'] for pred in predictions],
+            f"wordcloud_batch_{batch.id}.png"
+        )
+        pdf_content = report_service.generate_pdf_report(
+            predictions=predictions,
+            distribution=batch_distribution(batch),
+            wordcloud_path=wordcloud_url,
+            username=current_user.username
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error generating PDF: {str(e)}"
+        )
     
-    return history
+    return StreamingResponse(
+        io.BytesIO(pdf_content),
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f"attachment; filename=predictions_report_batch_{batch.id}.pdf"
+        }
+    )
+
+
+@router.delete("/batches/{batch_id}")
+async def delete_prediction_batch(
+    batch_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Delete a batch upload together with its history rows"""
+    batch = _get_user_batch(batch_id, current_user, db)
+    active_job = db.query(BatchJob.id).filter(
+        BatchJob.batch_id == batch.id,
+        BatchJob.status.in_(("queued", "running"))
+    ).first()
+    if active_job is not None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Batch is still being written by job {active_job.id}"
+        )
+    deleted_rows = delete_batch(db, batch)
+    db.commit()
+    return {"batch_id": batch_id, "deleted_rows": deleted_rows}
 
 
 @router.post("/download-csv")
@@ -341,14 +859,15 @@ async def analyze_ngrams(
 async def explain_prediction(
     request: SinglePredictionRequest,
     current_user: User = Depends(get_current_user),
-    ml_service: MLPredictionService = Depends(get_ml_service)
+    ml_service: MLPredictionService = Depends(get_ml_service),
+    executor: InferenceExecutor = Depends(get_inference_executor)
 ):
     """
     Get detailed explanation for a prediction
     
     Returns word importance scores and keyword analysis
     """
-    result = ml_service.predict_with_explanation(request.comment)
+    result = await executor.run(ml_service.predict_with_explanation, request.comment)
     
     return {
         "predicted_rating": result['rating'],
@@ -42,6 +42,7 @@ class ExplanationData(BaseModel):
     words: List[str]
     importance_scores: List[float]
     overall_sentiment: str
+    method: Optional[str] = None  # attribution method; None for keyword heuristics
 
 class KeywordData(BaseModel):
     positive_keywords: List[str]
@@ -83,6 +84,28 @@ class BatchPredictionResponse(BaseModel):
     pdf_download_url: str
     ngrams: Optional[NgramAnalysis] = None
     keyword_frequency: Optional[KeywordFrequency] = None
+    inference_stats: Optional[dict] = None
+    explanations: Optional[List[ExplanationData]] = None  # aligned with results
+    batch_id: Optional[int] = None  # see /api/predict/batches/{batch_id}
+
+class BatchJobResponse(BaseModel):
+    job_id: str
+    status: str
+    product_name: str
+    filename: Optional[str] = None
+    batch_id: Optional[int] = None
+    total_rows: Optional[int] = None
+    rows_done: int = 0
+    rows_per_second: Optional[float] = None
+    eta_seconds: Optional[float] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    status_url: str
+    result_url: Optional[str] = None
+    csv_download_url: Optional[str] = None
+    pdf_download_url: Optional[str] = None
 
 class PDFReportRequest(BaseModel):
     predictions: List[dict]
@@ -98,11 +121,25 @@ class PredictionHistoryResponse(BaseModel):
     predicted_rating: int
     confidence_score: Optional[float]
     prediction_type: str
+    batch_id: Optional[int] = None
     created_at: datetime
     
     class Config:
         from_attributes = True
 
+class PredictionBatchResponse(BaseModel):
+    batch_id: int
+    product_name: str
+    filename: Optional[str] = None
+    source: str
+    row_count: int
+    average_rating: Optional[float] = None
+    average_confidence: Optional[float] = None
+    rating_distribution: dict
+    created_at: datetime
+    predictions_url: str
+    pdf_download_url: str
+
 
 # ===== Analysis Schemas =====
 class NgramAnalysisRequest(BaseModel):
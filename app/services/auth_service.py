@@ -81,5 +81,10 @@ async def get_current_user(
     user = db.query(User).filter(User.username == token_data.username).first()
     if user is None:
         raise credentials_exception
-    
+
+    # Return the pooled connection now: prediction routes then wait on
+    # inference, and holding one connection per waiting request exhausts the
+    # pool. The user's loaded columns stay readable; the next query on this
+    # session checks out a connection again.
+    db.close()
     return user
@@ -0,0 +1,407 @@
+"""
+Batch Job Queue
+Runs CSV batch predictions in the background so uploads return immediately.
+
+Job state lives in the `batch_jobs` table and files in ML_JOB_DIR:
+    <job_id>.upload.csv    the uploaded file
+    <job_id>.results.csv   Comment, Predicted_Rating, Confidence (appended per chunk)
+    <job_id>.pdf           report, written when the job completes
+
+Every process runs a dispatcher that claims queued jobs with a conditional
+UPDATE (so several workers never run the same job) and hands them to a small
+thread pool. A running job commits its progress after each chunk, and a
+heartbeat thread refreshes it in between (model load, report generation); if
+the heartbeat stops for ML_JOB_STALE_SECONDS (process killed) the job is
+queued again and resumes after the last committed chunk. On shutdown, or if
+the model fails to load, the job goes back to the queue after its current
+chunk instead of failing.
+
+Chunk inference goes through the shared InferenceExecutor, so background
+jobs count against the same limit as interactive requests.
+"""
+import csv
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from app.config import (
+    ML_JOB_WORKERS,
+    ML_JOB_POLL_SECONDS,
+    ML_JOB_STALE_SECONDS,
+    ML_JOB_DIR,
+    ML_INGEST_CHUNK_ROWS,
+    ML_INGEST_READ_BYTES
+)
+from app.database import SessionLocal
+from app.models import BatchJob, PredictionBatch, User
+from app.services.csv_stream import iter_file_comments
+from app.services.history_service import save_batch_history, create_batch, finish_batch
+from app.services.inference_executor import get_inference_executor
+from app.services.ml_service import get_ml_service, BatchAnalysis, ModelLoadError
+from app.services.visualization_service import get_viz_service
+from app.services.report_service import get_report_service
+
+RESULT_FIELDS = ['Comment', 'Predicted_Rating', 'Confidence']
+
+
+class BatchJobManager:
+    """Creates jobs and runs queued ones on worker threads"""
+
+    def __init__(
+        self,
+        workers: int = ML_JOB_WORKERS,
+        poll_seconds: float = ML_JOB_POLL_SECONDS,
+        stale_seconds: float = ML_JOB_STALE_SECONDS,
+        job_dir: Path = ML_JOB_DIR
+    ):
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.stale_seconds = stale_seconds
+        self.job_dir = Path(job_dir)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._running: set = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._dispatcher: Optional[threading.Thread] = None
+
+    # ----- files -----
+
+    def upload_path(self, job_id: str) -> Path:
+        return self.job_dir / f"{job_id}.upload.csv"
+
+    def results_path(self, job_id: str) -> Path:
+        return self.job_dir / f"{job_id}.results.csv"
+
+    def pdf_path(self, job_id: str) -> Path:
+        return self.job_dir / f"{job_id}.pdf"
+
+    # ----- lifecycle -----
+
+    def start(self):
+        """Start the dispatcher thread (idempotent; 0 workers = only accept jobs)"""
+        if self._dispatcher is not None or self.workers <= 0:
+            return
+        self.job_dir.mkdir(parents=True, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch-job")
+        self._stop.clear()
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="batch-job-dispatcher", daemon=True)
+        self._dispatcher.start()
+        print(f"✅ Batch job workers started ({self.workers} thread(s))")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def new_job_id(self) -> str:
+        return uuid.uuid4().hex
+
+    async def save_upload(self, job_id: str, upload, chunk_size: int = ML_INGEST_READ_BYTES):
+        """Copy an UploadFile to upload_path(job_id) chunk by chunk"""
+        self.job_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.upload_path(job_id), "wb") as out:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                out.write(chunk)
+
+    def create_job(self, db, job_id: str, user_id: int, product_name: str, filename: Optional[str]) -> BatchJob:
+        """Queue a job whose upload has already been written to upload_path(job_id)"""
+        job = BatchJob(
+            id=job_id,
+            user_id=user_id,
+            product_name=product_name,
+            filename=filename,
+            status="queued"
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        self._wake.set()
+        return job
+
+    # ----- dispatching -----
+
+    def _dispatch_loop(self):
+        while not self._stop.is_set():
+            try:
+                self._requeue_stale()
+                while self._has_capacity():
+                    job_id = self._claim_next()
+                    if job_id is None:
+                        break
+                    with self._lock:
+                        self._running.add(job_id)
+                    self._pool.submit(self._run_job, job_id)
+            except Exception as e:
+                print(f"❌ Batch job dispatcher error: {e}")
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+    def _has_capacity(self) -> bool:
+        with self._lock:
+            return len(self._running) < self.workers
+
+    def _requeue_stale(self):
+        """Running jobs without a recent heartbeat belonged to a dead worker"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+        with self._lock:
+            running_here = list(self._running)
+        db = SessionLocal()
+        try:
+            query = db.query(BatchJob).filter(BatchJob.status == "running", BatchJob.updated_at < cutoff)
+            if running_here:
+                query = query.filter(BatchJob.id.notin_(running_here))
+            requeued = query.update({BatchJob.status: "queued"}, synchronize_session=False)
+            db.commit()
+            if requeued:
+                print(f"🔁 Requeued {requeued} stalled batch job(s)")
+        finally:
+            db.close()
+
+    def _claim_next(self) -> Optional[str]:
+        """Atomically move the oldest queued job to running; None if there is none"""
+        db = SessionLocal()
+        try:
+            candidates = db.query(BatchJob.id).filter(
+                BatchJob.status == "queued"
+            ).order_by(BatchJob.created_at).limit(5).all()
+            for (job_id,) in candidates:
+                now = datetime.utcnow()
+                claimed = db.query(BatchJob).filter(
+                    BatchJob.id == job_id,
+                    BatchJob.status == "queued"
+                ).update(
+                    {BatchJob.status: "running", BatchJob.started_at: now, BatchJob.updated_at: now},
+                    synchronize_session=False
+                )
+                db.commit()
+                if claimed:
+                    return job_id
+            return None
+        finally:
+            db.close()
+
+    # ----- running -----
+
+    def _run_job(self, job_id: str):
+        db = SessionLocal()
+        heartbeat_done = threading.Event()
+        threading.Thread(
+            target=self._heartbeat,
+            args=(job_id, heartbeat_done),
+            name=f"batch-job-heartbeat-{job_id[:8]}",
+            daemon=True
+        ).start()
+        try:
+            job = db.get(BatchJob, job_id)
+            self._process(db, job)
+        except ModelLoadError as e:
+            # Transient: leave the job for a later attempt (the dispatcher's
+            # next poll, not straight away)
+            db.rollback()
+            self._requeue(db, job_id)
+            print(f"🔁 Batch job {job_id} requeued, model unavailable: {e}")
+            return
+        except Exception as e:
+            db.rollback()
+            job = db.get(BatchJob, job_id)
+            if job is not None:
+                job.status = "failed"
+                job.error = str(e)
+                job.finished_at = datetime.utcnow()
+                db.commit()
+            print(f"❌ Batch job {job_id} failed: {e}")
+        finally:
+            heartbeat_done.set()
+            db.close()
+            with self._lock:
+                self._running.discard(job_id)
+        self._wake.set()
+
+    def _heartbeat(self, job_id: str, done: threading.Event):
+        """Keep updated_at fresh while the job runs, including between chunks"""
+        interval = max(self.stale_seconds / 3, 1)
+        while not done.wait(interval):
+            db = SessionLocal()
+            try:
+                db.query(BatchJob).filter(
+                    BatchJob.id == job_id,
+                    BatchJob.status == "running"
+                ).update({BatchJob.updated_at: datetime.utcnow()}, synchronize_session=False)
+                db.commit()
+            except Exception as e:
+                print(f"⚠️ Batch job {job_id} heartbeat failed: {e}")
+            finally:
+                db.close()
+
+    @staticmethod
+    def _requeue(db, job_id: str):
+        db.query(BatchJob).filter(
+            BatchJob.id == job_id,
+            BatchJob.status == "running"
+        ).update({BatchJob.status: "queued"}, synchronize_session=False)
+        db.commit()
+
+    def _process(self, db, job: BatchJob):
+        ml_service = get_ml_service()
+        executor = get_inference_executor()
+        upload_path = self.upload_path(job.id)
+        results_path = self.results_path(job.id)
+        analysis = ml_service.new_batch_analysis()
+
+        # Resume: keep the rows committed before the restart
+        resumed_rows = job.rows_done or 0
+        self._restore_results(results_path, resumed_rows, analysis)
+
+        if job.total_rows is None:
+            job.total_rows = sum(1 for _ in iter_file_comments(upload_path))
+            db.commit()
+        batch = self._get_batch(db, job)
+        print(f"🚀 Batch job {job.id}: {job.total_rows} rows"
+              + (f", resuming at {resumed_rows}" if resumed_rows else ""))
+
+        started = time.monotonic()
+        with open(results_path, "a", newline="", encoding="utf-8") as out:
+            writer = csv.writer(out)
+            if resumed_rows == 0:
+                writer.writerow(RESULT_FIELDS)
+            for chunk in self._chunks(iter_file_comments(upload_path), skip=resumed_rows):
+                if self._stop.is_set():
+                    break
+                predictions = executor.call(ml_service.predict_batch_chunk, chunk, analysis)
+
+                # Results file first, then the committed progress marker
+                writer.writerows([p['text'], p['rating'], p['confidence']] for p in predictions)
+                out.flush()
+                save_batch_history(db, batch.id, predictions)
+                job.rows_done += len(predictions)
+                job.rows_per_second = round((job.rows_done - resumed_rows) / max(time.monotonic() - started, 1e-6), 2)
+                job.updated_at = datetime.utcnow()
+                db.commit()
+
+        if self._stop.is_set():
+            # Shutting down: the next process resumes after the last committed chunk
+            self._requeue(db, job.id)
+            print(f"⏸️ Batch job {job.id} requeued at {job.rows_done} rows (shutting down)")
+            return
+
+        if job.rows_done == 0:
+            raise ValueError("No valid comments found in CSV")
+
+        self._finish(db, job, batch, analysis)
+
+    @staticmethod
+    def _get_batch(db, job: BatchJob) -> PredictionBatch:
+        """The job's prediction batch, created on its first run"""
+        batch = db.get(PredictionBatch, job.batch_id) if job.batch_id else None
+        if batch is None:
+            batch = create_batch(db, job.user_id, job.product_name, job.filename, source="job")
+            job.batch_id = batch.id
+            db.commit()
+        return batch
+
+    @staticmethod
+    def _chunks(comments, skip: int = 0, size: int = ML_INGEST_CHUNK_ROWS):
+        chunk = []
+        for index, comment in enumerate(comments):
+            if index < skip:
+                continue
+            chunk.append(comment)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def _restore_results(results_path: Path, rows: int, analysis: BatchAnalysis):
+        """Truncate the results file to `rows` data rows and replay them into `analysis`"""
+        if rows == 0 or not results_path.exists():
+            if results_path.exists():
+                results_path.unlink()
+            return
+        tmp_path = results_path.with_suffix(".tmp")
+        with open(results_path, newline="", encoding="utf-8") as src, \
+                open(tmp_path, "w", newline="", encoding="utf-8") as dst:
+            reader = csv.reader(src)
+            writer = csv.writer(dst)
+            writer.writerow(next(reader))
+            texts, predictions = [], []
+            for index, row in enumerate(reader):
+                if index >= rows:
+                    break
+                writer.writerow(row)
+                texts.append(row[0])
+                predictions.append({'rating': int(row[1]), 'confidence': float(row[2])})
+                if len(texts) >= ML_INGEST_CHUNK_ROWS:
+                    analysis.add(texts, predictions)
+                    texts, predictions = [], []
+            if texts:
+                analysis.add(texts, predictions)
+        os.replace(tmp_path, results_path)
+
+    def _finish(self, db, job: BatchJob, batch: PredictionBatch, analysis: BatchAnalysis):
+        """Word cloud, PDF and summary once every row is predicted"""
+        viz_service = get_viz_service()
+        report_service = get_report_service()
+
+        predictions = self.read_results(job.id)
+        distribution = viz_service.calculate_rating_distribution(analysis.ratings)
+        wordcloud_url = viz_service.generate_wordcloud(
+            [p['text'] for p in predictions],
+            f"wordcloud_job_{job.id}.png"
+        )
+        user = db.get(User, job.user_id)
+        pdf_content = report_service.generate_pdf_report(
+            predictions=predictions,
+            distribution=distribution,
+            wordcloud_path=wordcloud_url,
+            username=user.username if user else "",
+            filename=self.pdf_path(job.id).name
+        )
+        self.pdf_path(job.id).write_bytes(pdf_content)
+
+        job.summary = json.dumps({
+            'rating_distribution': distribution,
+            'wordcloud_url': wordcloud_url,
+            'ngrams': analysis.ngrams,
+            'keyword_frequency': analysis.keyword_frequency,
+            'inference_stats': analysis.inference_stats
+        }, ensure_ascii=False)
+        finish_batch(batch, analysis)
+        job.status = "completed"
+        job.finished_at = datetime.utcnow()
+        job.updated_at = job.finished_at
+        db.commit()
+        print(f"✅ Batch job {job.id} completed: {job.rows_done} rows")
+
+    def read_results(self, job_id: str) -> List[Dict[str, Any]]:
+        """Predictions of a job as {'text', 'rating', 'confidence'} dicts"""
+        with open(self.results_path(job_id), newline="", encoding="utf-8") as f:
+            return [
+                {
+                    'text': row['Comment'],
+                    'rating': int(row['Predicted_Rating']),
+                    'confidence': float(row['Confidence'])
+                }
+                for row in csv.DictReader(f)
+            ]
+
+
+# Singleton instance
+batch_job_manager = BatchJobManager()
+
+
+def get_batch_job_manager() -> BatchJobManager:
+    """Dependency to get the batch job manager"""
+    return batch_job_manager
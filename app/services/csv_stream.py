@@ -0,0 +1,272 @@
+"""
+Streaming CSV Ingestion
+Parses uploaded CSV files incrementally: chunked reads, incremental decoding
+and row-by-row parsing, so memory depends on the chunk size rather than the
+file size.
+
+Encoding is detected from the first bytes: UTF-8 (with or without BOM) or
+UTF-16 (BOM, or BOM-less as some Excel exports are). The delimiter is taken
+from the header line (comma, tab as in Excel "Unicode Text", or semicolon).
+"""
+import asyncio
+import codecs
+import csv
+import inspect
+from collections import deque
+from pathlib import Path
+from typing import AsyncIterator, Iterator, List, Optional
+
+from app.config import ML_INGEST_READ_BYTES
+
+DELIMITERS = (",", "\t", ";")
+ENCODING_SAMPLE_BYTES = 64
+
+
+class CSVFormatError(ValueError):
+    """Upload cannot be decoded or lacks the expected column"""
+
+
+def detect_encoding(head: bytes) -> str:
+    """Codec name for an upload given its first bytes"""
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"  # the decoder reads the BOM
+    # BOM-less UTF-16: ASCII characters leave NUL bytes in every other position
+    sample = head[:ENCODING_SAMPLE_BYTES]
+    if len(sample) >= 4 and sample.count(0) >= len(sample) // 4:
+        odd_nuls = sample[1::2].count(0)
+        even_nuls = sample[0::2].count(0)
+        return "utf-16-le" if odd_nuls > even_nuls else "utf-16-be"
+    return "utf-8"
+
+
+class CSVRowParser:
+    """
+    Push parser: feed decoded text, get back complete rows.
+    Lines are handed to one csv.reader only once the record is complete
+    (balanced quotes), so quoted fields may contain newlines.
+    """
+
+    def __init__(self, delimiter: Optional[str] = None, header_hint: Optional[str] = None):
+        self.delimiter = delimiter
+        self.header_hint = header_hint
+        self._partial_line = ""
+        self._record: List[str] = []
+        self._quotes = 0
+        self._lines: deque = deque()
+        self._reader = None
+
+    # csv.reader pulls lines from the parser itself
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self._lines:
+            raise StopIteration
+        return self._lines.popleft()
+
+    def feed(self, text: str) -> List[List[str]]:
+        self._partial_line += text
+        *lines, self._partial_line = self._partial_line.split("\n")
+        rows = []
+        for line in lines:
+            rows.extend(self._add_line(line + "\n"))
+        return rows
+
+    def close(self) -> List[List[str]]:
+        """Flush the last line and any unterminated record"""
+        rows = []
+        if self._partial_line:
+            rows.extend(self._add_line(self._partial_line))
+            self._partial_line = ""
+        if self._record:
+            rows.extend(self._flush_record())
+        return rows
+
+    def _add_line(self, line: str) -> List[List[str]]:
+        self._record.append(line)
+        self._quotes += line.count('"')
+        if self._quotes % 2:
+            return []  # inside a quoted field
+        return self._flush_record()
+
+    def _flush_record(self) -> List[List[str]]:
+        record, self._record, self._quotes = self._record, [], 0
+        if self._reader is None:
+            if self.delimiter is None:
+                self.delimiter = self._sniff_delimiter("".join(record))
+            self._reader = csv.reader(self, delimiter=self.delimiter)
+        self._lines.extend(record)
+        rows = []
+        while self._lines:
+            try:
+                rows.append(next(self._reader))
+            except StopIteration:
+                break
+        return rows
+
+    def _sniff_delimiter(self, header: str) -> str:
+        """Delimiter that splits the header into the hinted column (else the most fields)"""
+        best, best_fields = ",", 1
+        for delimiter in DELIMITERS:
+            fields = next(csv.reader([header], delimiter=delimiter), [])
+            if self.header_hint and self.header_hint in (f.strip() for f in fields):
+                return delimiter
+            if len(fields) > best_fields:
+                best, best_fields = delimiter, len(fields)
+        return best
+
+
+class CSVDecoder:
+    """Bytes in, rows out: encoding detection, incremental decoding, CSVRowParser"""
+
+    def __init__(self, header_hint: Optional[str] = None):
+        self.parser = CSVRowParser(header_hint=header_hint)
+        self._head = b""
+        self._decoder = None
+
+    def feed(self, data: bytes) -> List[List[str]]:
+        if self._decoder is None:
+            # Wait for enough leading bytes to detect the encoding
+            self._head += data
+            if len(self._head) < ENCODING_SAMPLE_BYTES:
+                return []
+            data, self._head = self._head, b""
+            self._decoder = codecs.getincrementaldecoder(detect_encoding(data))()
+        return self._parse(data, final=False)
+
+    def close(self) -> List[List[str]]:
+        if self._decoder is None:
+            self._decoder = codecs.getincrementaldecoder(detect_encoding(self._head))()
+            rows = self._parse(self._head, final=False)
+        else:
+            rows = []
+        return rows + self._parse(b"", final=True)
+
+    def _parse(self, data: bytes, final: bool) -> List[List[str]]:
+        try:
+            text = self._decoder.decode(data, final=final)
+        except UnicodeDecodeError as e:
+            raise CSVFormatError(f"File is not valid UTF-8 or UTF-16 text: {e.reason}")
+        try:
+            rows = self.parser.feed(text)
+            if final:
+                rows += self.parser.close()
+        except csv.Error as e:
+            raise CSVFormatError(f"Malformed CSV: {e}")
+        return rows
+
+
+def _column_index(header: List[str], column: str) -> int:
+    header = [field.strip() for field in header]
+    if column not in header:
+        raise CSVFormatError(f"CSV must contain '{column}' column")
+    return header.index(column)
+
+
+def _cell(row: List[str], index: int) -> str:
+    return row[index].strip() if index < len(row) else ""
+
+
+async def iter_csv_rows(
+    upload,
+    chunk_size: int = ML_INGEST_READ_BYTES,
+    header_hint: Optional[str] = None
+) -> AsyncIterator[List[str]]:
+    """
+    Rows (header first) of an UploadFile (or a binary file object), read and
+    decoded chunk by chunk
+    """
+    decoder = CSVDecoder(header_hint=header_hint)
+    while True:
+        chunk = upload.read(chunk_size)
+        if inspect.isawaitable(chunk):
+            chunk = await chunk
+        rows = decoder.feed(chunk) if chunk else decoder.close()
+        for row in rows:
+            yield row
+        if not chunk:
+            break
+
+
+async def iter_comments(upload, column: str = "Comment", **kwargs) -> AsyncIterator[str]:
+    """Non-empty, stripped values of `column`; CSVFormatError if it is missing"""
+    index = None
+    async for row in iter_csv_rows(upload, header_hint=column, **kwargs):
+        if index is None:
+            index = _column_index(row, column)
+            continue
+        value = _cell(row, index)
+        if value:
+            yield value
+    if index is None:
+        raise CSVFormatError(f"CSV must contain '{column}' column")
+
+
+def iter_file_comments(
+    path: Path,
+    column: str = "Comment",
+    chunk_size: int = ML_INGEST_READ_BYTES
+) -> Iterator[str]:
+    """Synchronous iter_comments over a file on disk"""
+    decoder = CSVDecoder(header_hint=column)
+    index = None
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            for row in (decoder.feed(chunk) if chunk else decoder.close()):
+                if index is None:
+                    index = _column_index(row, column)
+                    continue
+                value = _cell(row, index)
+                if value:
+                    yield value
+            if not chunk:
+                break
+    if index is None:
+        raise CSVFormatError(f"CSV must contain '{column}' column")
+
+
+async def iter_comment_batches(
+    upload,
+    batch_size: int,
+    max_pending: int,
+    column: str = "Comment",
+    first_batch_size: Optional[int] = None
+) -> AsyncIterator[List[str]]:
+    """
+    Comments in lists of `batch_size`. Parsing runs ahead of the consumer
+    in a separate task, bounded by a queue of `max_pending` batches.
+    With `first_batch_size`, batches start that small and double up to
+    `batch_size` (early first results for streaming).
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_pending))
+
+    async def produce():
+        try:
+            batch = []
+            size = min(first_batch_size or batch_size, batch_size)
+            async for comment in iter_comments(upload, column):
+                batch.append(comment)
+                if len(batch) >= size:
+                    await queue.put(batch)
+                    batch = []
+                    size = min(size * 2, batch_size)
+            if batch:
+                await queue.put(batch)
+            await queue.put(None)
+        except Exception as e:
+            await queue.put(e)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
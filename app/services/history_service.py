@@ -0,0 +1,181 @@
+"""
+Prediction History Persistence
+Each upload is one prediction_batches row (user, product, file, row count,
+summary stats); its prediction_history rows only hold the comment, rating,
+confidence and the indexed batch_id, so a batch is listed, reported on or
+deleted without scanning the history, and rows do not repeat the batch's
+user, product and type.
+
+Batch rows are bulk inserted without building one ORM object per row:
+chunked executemany INSERTs through SQLAlchemy Core, or COPY FROM STDIN on
+PostgreSQL (psycopg2, the driver app.database names). The caller commits.
+"""
+import csv
+import heapq
+import io
+import json
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, joinedload
+
+from app.config import ML_HISTORY_INSERT_CHUNK, ML_HISTORY_COPY
+from app.models import PredictionHistory, PredictionBatch, BatchJob
+
+COPY_COLUMNS = ("batch_id", "comment", "predicted_rating", "confidence_score", "created_at")
+
+
+def _use_copy(db: Session) -> bool:
+    dialect = db.get_bind().dialect
+    return ML_HISTORY_COPY and dialect.name == "postgresql" and dialect.driver == "psycopg2"
+
+
+def _insert_rows(db: Session, rows: List[Dict[str, Any]]):
+    """executemany INSERT (batched into multi-row statements by SQLAlchemy 2.x)"""
+    # Core table insert: keeps the explicit NULLs (an ORM bulk insert fills in
+    # the 'single' prediction_type default)
+    db.execute(insert(PredictionHistory.__table__), rows)
+
+
+def _copy_rows(db: Session, rows: List[Dict[str, Any]]):
+    """COPY ... FROM STDIN (CSV) on the session's connection, inside its transaction"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            row["batch_id"],
+            row["comment"],
+            row["predicted_rating"],
+            "" if row["confidence_score"] is None else row["confidence_score"],
+            row["created_at"].isoformat()
+        ])
+    buffer.seek(0)
+
+    dbapi_connection = db.connection().connection
+    with dbapi_connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {PredictionHistory.__tablename__} ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+
+
+def save_batch_history(
+    db: Session,
+    batch_id: int,
+    predictions: Iterable[Dict[str, Any]],
+    chunk_size: int = ML_HISTORY_INSERT_CHUNK
+) -> int:
+    """
+    Insert one history row per prediction ({'text', 'rating', 'confidence'})
+    of batch `batch_id` in chunks of `chunk_size`. Returns the number of rows
+    written.
+    """
+    write = _copy_rows if _use_copy(db) else _insert_rows
+    created_at = datetime.utcnow()
+    written = 0
+    chunk: List[Dict[str, Any]] = []
+    for pred in predictions:
+        chunk.append({
+            "batch_id": batch_id,
+            "comment": pred["text"],
+            "predicted_rating": pred["rating"],
+            "confidence_score": pred["confidence"],
+            "prediction_type": None,  # explicit: the column defaults to 'single'
+            "created_at": created_at
+        })
+        if len(chunk) >= chunk_size:
+            write(db, chunk)
+            written += len(chunk)
+            chunk = []
+    if chunk:
+        write(db, chunk)
+        written += len(chunk)
+    return written
+
+
+def create_batch(
+    db: Session,
+    user_id: int,
+    product_name: str,
+    filename: Optional[str] = None,
+    source: str = "batch"
+) -> PredictionBatch:
+    """Add an (empty) batch row and flush it so its id can go on history rows"""
+    batch = PredictionBatch(
+        user_id=user_id,
+        product_name=product_name,
+        filename=filename,
+        source=source,
+        row_count=0
+    )
+    db.add(batch)
+    db.flush()
+    return batch
+
+
+def finish_batch(batch: PredictionBatch, analysis) -> PredictionBatch:
+    """Store row count and summary stats from a BatchAnalysis; the caller commits"""
+    batch.row_count = analysis.total
+    batch.average_rating = analysis.average_rating
+    batch.average_confidence = analysis.average_confidence
+    batch.rating_distribution = json.dumps(analysis.rating_distribution)
+    return batch
+
+
+def batch_distribution(batch: PredictionBatch) -> Dict[int, int]:
+    """{rating: count} stored on a batch"""
+    if not batch.rating_distribution:
+        return {rating: 0 for rating in range(1, 6)}
+    return {int(rating): count for rating, count in json.loads(batch.rating_distribution).items()}
+
+
+def delete_batch(db: Session, batch: PredictionBatch) -> int:
+    """Delete a batch and its history rows (one indexed DELETE); returns rows deleted"""
+    deleted = db.query(PredictionHistory).filter(
+        PredictionHistory.batch_id == batch.id
+    ).delete(synchronize_session=False)
+    db.query(BatchJob).filter(
+        BatchJob.batch_id == batch.id
+    ).update({BatchJob.batch_id: None}, synchronize_session=False)
+    db.delete(batch)
+    return deleted
+
+
+def history_record(row: PredictionHistory) -> Dict[str, Any]:
+    """A history row with product and type read through its batch (PredictionHistoryResponse)"""
+    batch = row.batch
+    return {
+        "id": row.id,
+        # Single predictions stored before the default may have no product name
+        "product_name": (batch.product_name if batch is not None else row.product_name) or "Unknown Product",
+        "comment": row.comment,
+        "predicted_rating": row.predicted_rating,
+        "confidence_score": row.confidence_score,
+        "prediction_type": row.prediction_type or ("batch" if row.batch_id is not None else "single"),
+        "batch_id": row.batch_id,
+        "created_at": row.created_at
+    }
+
+
+def user_history(db: Session, user_id: int, limit: int) -> List[Dict[str, Any]]:
+    """
+    Latest `limit` history rows of a user: rows carrying user_id (single
+    predictions, legacy batch rows) merged with the rows of the user's
+    batches; each side is one indexed, limited query.
+    """
+    own_rows = db.query(PredictionHistory).options(
+        joinedload(PredictionHistory.batch)
+    ).filter(
+        PredictionHistory.user_id == user_id
+    ).order_by(PredictionHistory.created_at.desc()).limit(limit).all()
+
+    batch_ids = db.query(PredictionBatch.id).filter(PredictionBatch.user_id == user_id)
+    batch_rows = db.query(PredictionHistory).options(
+        joinedload(PredictionHistory.batch)
+    ).filter(
+        PredictionHistory.batch_id.in_(batch_ids.scalar_subquery())
+    ).order_by(PredictionHistory.created_at.desc(), PredictionHistory.id.desc()).limit(limit).all()
+
+    rows = heapq.merge(own_rows, batch_rows, key=lambda row: row.created_at, reverse=True)
+    return [history_record(row) for row in list(rows)[:limit]]
@@ -0,0 +1,94 @@
+"""
+Inference Executor
+Runs blocking model calls in a bounded thread pool off the event loop
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from fastapi import HTTPException, status
+
+from app.config import ML_INFERENCE_WORKERS, ML_INFERENCE_QUEUE_DEPTH, ML_INFERENCE_RETRY_AFTER
+
+
+class InferenceExecutor:
+    """
+    Thread pool with a hard cap on running + queued jobs.
+    When the cap is reached new jobs are rejected with 503 instead of piling up;
+    background work (call) waits for a free slot instead.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = ML_INFERENCE_WORKERS,
+        queue_depth: int = ML_INFERENCE_QUEUE_DEPTH,
+        retry_after: int = ML_INFERENCE_RETRY_AFTER
+    ):
+        self.max_workers = max_workers
+        self.capacity = max_workers + queue_depth
+        self.retry_after = retry_after
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._lock = threading.Condition()
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs running or waiting for a worker"""
+        return self._pending
+
+    def busy_error(self) -> HTTPException:
+        """503 with Retry-After, for callers that queue work of their own"""
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Prediction service is busy, please retry shortly",
+            headers={"Retry-After": str(self.retry_after)}
+        )
+
+    def _acquire(self):
+        with self._lock:
+            if self._pending >= self.capacity:
+                raise self.busy_error()
+            self._pending += 1
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+            self._lock.notify()
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run func(*args) in the pool and await its result"""
+        self._acquire()
+        try:
+            future = self._pool.submit(func, *args)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def call(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Blocking run() for background threads: waits for capacity instead of a 503"""
+        with self._lock:
+            while self._pending >= self.capacity:
+                self._lock.wait()
+            self._pending += 1
+        try:
+            future = self._pool.submit(func, *args)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future.result()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Singleton instance
+inference_executor = InferenceExecutor()
+
+
+def get_inference_executor() -> InferenceExecutor:
+    """Dependency to get inference executor"""
+    return inference_executor
@@ -0,0 +1,112 @@
+"""
+Micro-Batching Service
+Collects concurrent single-comment predictions and runs them as one batch
+"""
+import asyncio
+from typing import List, Dict, Any, Optional, Tuple
+
+from app.config import ML_MICROBATCH_MAX_WAIT_MS, ML_MICROBATCH_MAX_SIZE
+from app.services.ml_service import get_ml_service, MLPredictionService
+from app.services.inference_executor import get_inference_executor, InferenceExecutor
+
+
+class PredictionMicroBatcher:
+    """
+    Queues single predictions for a few milliseconds so concurrent requests
+    share one forward pass. Each caller awaits its own future.
+
+    Up to `executor.max_workers` batches run at once; the waiting queue holds
+    at most as many comments as the executor's capacity in full batches, and
+    requests beyond that get the executor's 503 (Retry-After) right away.
+    """
+
+    def __init__(
+        self,
+        ml_service: MLPredictionService,
+        executor: InferenceExecutor,
+        max_wait_ms: float = ML_MICROBATCH_MAX_WAIT_MS,
+        max_batch_size: int = ML_MICROBATCH_MAX_SIZE
+    ):
+        self.ml_service = ml_service
+        self.executor = executor
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.max_queued = executor.capacity * max_batch_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._in_flight: set = set()
+        self._worker: Optional[asyncio.Task] = None
+
+    def _ensure_worker(self):
+        """Start the background worker on the running event loop (first call only)"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue(maxsize=self.max_queued)
+            self._slots = asyncio.Semaphore(max(1, self.executor.max_workers))
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def predict(self, text: str) -> Dict[str, Any]:
+        """Predict rating for a single comment (same result as predict_single)"""
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((text, future))
+        except asyncio.QueueFull:
+            raise self.executor.busy_error()
+        return await future
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        """Wait for one request, then gather more until max wait or max size"""
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        """Worker loop: collect a group whenever a worker slot is free and dispatch it"""
+        while True:
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            task = asyncio.get_running_loop().create_task(self._predict(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _predict(self, batch: List[Tuple[str, asyncio.Future]]):
+        """One batched inference call; resolves the callers' futures"""
+        texts = [text for text, _ in batch]
+        try:
+            predictions = await self.executor.run(self.ml_service.predict_batch, texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        for (_, future), prediction in zip(batch, predictions):
+            if not future.done():
+                future.set_result({
+                    'rating': prediction['rating'],
+                    'confidence': prediction['confidence']
+                })
+
+
+# Singleton instance
+micro_batcher = PredictionMicroBatcher(get_ml_service(), get_inference_executor())
+
+
+def get_micro_batcher() -> PredictionMicroBatcher:
+    """Dependency to get prediction micro-batcher"""
+    return micro_batcher
@@ -4,58 +4,222 @@ Enhanced with: SHAP Explanation, N-gram Analysis, Keyword Detection
 """
 import os
 import re
-from typing import List, Dict, Any, Optional
-from collections import Counter
+import json
+import threading
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+from collections import Counter, deque
+
+import numpy as np
 # [QUAN TRỌNG] Import thư viện để tải model từ kho riêng
-from huggingface_hub import hf_hub_download
+from huggingface_hub import hf_hub_download, try_to_load_from_cache
+
+from app.config import (
+    ML_BATCH_SIZE,
+    ML_MAX_LENGTH,
+    ML_MAX_BATCH_TOKENS,
+    ML_WARMUP_LENGTHS,
+    ML_QUANTIZE,
+    ML_ARTIFACT_DIR,
+    ML_BACKEND,
+    ML_ONNX_THREADS,
+    ML_MMAP_WEIGHTS,
+    ML_FAST_LOAD,
+    ML_BUNDLE_DIR,
+    ML_FAST_TOKENIZER,
+    ML_SEGMENT_CACHE_SIZE,
+    ML_SEGMENT_WORKERS,
+    ML_SEGMENT_PARALLEL_MIN,
+    ML_KEYWORD_LEXICON,
+    ML_EXPLAIN_METHOD,
+    ML_EXPLAIN_IG_STEPS,
+    ML_EXPLAIN_BUDGET_MS,
+    ML_EXPLAIN_CACHE_SIZE,
+    ML_CACHE_TTL
+)
+from app.services.prediction_cache import create_prediction_cache, comment_key, PredictionCache
+from app.services.attribution import AttributionEngine
+from app.services.model_bundle import ModelBundle, DEFAULT_TOKENIZER_DIR, sha256_file
+from app.services.segmentation import VietnameseSegmenter
 
 # Only set HF cache for local development
 # if not os.getenv("RENDER") and not os.getenv("SPACE_ID"):
 #     os.environ['HF_HOME'] = 'G:/huggingface_cache'
 
 
+# Vietnamese positive keywords
+DEFAULT_POSITIVE_WORDS = [
+    'tốt', 'đẹp', 'tuyệt vời', 'xuất sắc', 'hoàn hảo', 'chất lượng',
+    'nhanh', 'tiện', 'ưng', 'hài lòng', 'thích', 'yêu', 'tuyệt',
+    'ok', 'ổn', 'được', 'giỏi', 'hay', 'ngon', 'xịn', 'đỉnh',
+    'pro', 'amazing', 'perfect', 'good', 'great', 'excellent',
+    'rẻ', 'đáng tiền', 'đáng mua', 'recommend', 'khuyên', 'nên mua',
+    'chính hãng', 'uy tín', 'nhiệt tình', 'chu đáo', 'cảm ơn',
+    'giao nhanh', 'đóng gói cẩn thận', 'đúng mô tả', 'như hình',
+    'rất tốt', 'rất đẹp', 'rất ưng', 'rất thích', 'siêu', 'quá đẹp'
+]
+
+# Vietnamese negative keywords
+DEFAULT_NEGATIVE_WORDS = [
+    'tệ', 'xấu', 'kém', 'dở', 'tồi', 'thất vọng', 'chán',
+    'chậm', 'lâu', 'lỗi', 'hỏng', 'vỡ', 'rách', 'bẩn',
+    'giả', 'fake', 'lừa', 'đắt', 'không đáng', 'phí tiền',
+    'bad', 'poor', 'terrible', 'awful', 'worst', 'horrible',
+    'không thích', 'không ưng', 'không hài lòng', 'không như',
+    'trả lại', 'hoàn tiền', 'không đúng', 'sai', 'thiếu',
+    'giao chậm', 'đóng gói ẩu', 'móp', 'méo', 'cũ', 'rất tệ',
+    'quá tệ', 'không tốt', 'không ok', 'dở ẹt', 'rất xấu'
+]
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over a keyword list.
+    Finds every (possibly overlapping) occurrence in one pass over the text.
+    """
+
+    def __init__(self, keywords: List[str]):
+        self.keywords = keywords
+        # Trie: goto[state] = {char: next_state}; outputs[state] = keyword indices ending here
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[int]] = [[]]
+
+        for index, keyword in enumerate(keywords):
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._outputs.append([])
+                state = next_state
+            if keyword:
+                self._outputs[state].append(index)
+
+        # Breadth-first failure links; outputs inherit from their fail state
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+
+    def find_all(self, text: str) -> List[Tuple[int, int, int]]:
+        """All matches as (start, end, keyword index), ordered by end position"""
+        goto, fail, outputs, keywords = self._goto, self._fail, self._outputs, self.keywords
+        matches = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in outputs[state]:
+                end = position + 1
+                matches.append((end - len(keywords[index]), end, index))
+        return matches
+
+
 class KeywordAnalyzer:
     """Analyzes text for positive/negative keywords"""
     
-    def __init__(self):
-        # Vietnamese positive keywords
-        self.positive_words = [
-            'tốt', 'đẹp', 'tuyệt vời', 'xuất sắc', 'hoàn hảo', 'chất lượng',
-            'nhanh', 'tiện', 'ưng', 'hài lòng', 'thích', 'yêu', 'tuyệt',
-            'ok', 'ổn', 'được', 'giỏi', 'hay', 'ngon', 'xịn', 'đỉnh',
-            'pro', 'amazing', 'perfect', 'good', 'great', 'excellent',
-            'rẻ', 'đáng tiền', 'đáng mua', 'recommend', 'khuyên', 'nên mua',
-            'chính hãng', 'uy tín', 'nhiệt tình', 'chu đáo', 'cảm ơn',
-            'giao nhanh', 'đóng gói cẩn thận', 'đúng mô tả', 'như hình',
-            'rất tốt', 'rất đẹp', 'rất ưng', 'rất thích', 'siêu', 'quá đẹp'
-        ]
-        
-        # Vietnamese negative keywords
-        self.negative_words = [
-            'tệ', 'xấu', 'kém', 'dở', 'tồi', 'thất vọng', 'chán',
-            'chậm', 'lâu', 'lỗi', 'hỏng', 'vỡ', 'rách', 'bẩn',
-            'giả', 'fake', 'lừa', 'đắt', 'không đáng', 'phí tiền',
-            'bad', 'poor', 'terrible', 'awful', 'worst', 'horrible',
-            'không thích', 'không ưng', 'không hài lòng', 'không như',
-            'trả lại', 'hoàn tiền', 'không đúng', 'sai', 'thiếu',
-            'giao chậm', 'đóng gói ẩu', 'móp', 'méo', 'cũ', 'rất tệ',
-            'quá tệ', 'không tốt', 'không ok', 'dở ẹt', 'rất xấu'
-        ]
+    def __init__(self, lexicon_path: Optional[str] = None):
+        self.positive_words = list(DEFAULT_POSITIVE_WORDS)
+        self.negative_words = list(DEFAULT_NEGATIVE_WORDS)
+        if lexicon_path:
+            self.load_lexicon(lexicon_path)
+        else:
+            self._compile()
+
+    def load_lexicon(self, path: str):
+        """
+        Replace the keyword lists from a JSON file:
+        {"positive": ["tốt", ...], "negative": ["tệ", ...]}
+        """
+        with open(path, encoding="utf-8") as f:
+            lexicon = json.load(f)
+        self.positive_words = [w for w in lexicon.get("positive", []) if w.strip()]
+        self.negative_words = [w for w in lexicon.get("negative", []) if w.strip()]
+        self._compile()
+
+    def _compile(self):
+        """Build one automaton over both lists (matching is case-insensitive)"""
+        keywords = [w.lower() for w in self.positive_words + self.negative_words]
+        self._num_positive = len(self.positive_words)
+        self._automaton = KeywordAutomaton(keywords)
+
+        # Token polarity lookup: every substring of a keyword ("token in keyword");
+        # the automaton covers the other direction ("keyword in token")
+        self._positive_parts = self._substrings(keywords[:self._num_positive])
+        self._negative_parts = self._substrings(keywords[self._num_positive:])
+        self._token_polarity: Dict[str, int] = {}
+
+    @staticmethod
+    def _substrings(words: List[str]) -> set:
+        return {
+            word[start:end]
+            for word in words
+            for start in range(len(word))
+            for end in range(start + 1, len(word) + 1)
+        }
+
+    def token_polarity(self, token: str) -> int:
+        """
+        1 if the token and a positive keyword contain one another, else -1 for
+        a negative keyword, else 0. Memoized per token (bounded by the vocabulary).
+        """
+        polarity = self._token_polarity.get(token)
+        if polarity is None:
+            lowered = token.lower()
+            contained = set(index for _, _, index in self._automaton.find_all(lowered))
+            if lowered in self._positive_parts or any(i < self._num_positive for i in contained):
+                polarity = 1
+            elif lowered in self._negative_parts or any(i >= self._num_positive for i in contained):
+                polarity = -1
+            else:
+                polarity = 0
+            self._token_polarity[token] = polarity
+        return polarity
+
+    @staticmethod
+    def _lower(text: str) -> str:
+        """Lowercase without changing length, so match offsets index the original text"""
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            return lowered
+        return ''.join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+    def find_matches(self, text: str) -> List[Dict[str, Any]]:
+        """Every keyword occurrence with its span in `text` and polarity"""
+        matches = []
+        for start, end, index in self._automaton.find_all(self._lower(text)):
+            if index < self._num_positive:
+                word, polarity = self.positive_words[index], 'positive'
+            else:
+                word, polarity = self.negative_words[index - self._num_positive], 'negative'
+            matches.append({'start': start, 'end': end, 'word': word, 'polarity': polarity, 'index': index})
+        return matches
     
-    def analyze(self, text: str) -> Dict[str, Any]:
-        """Analyze text for positive/negative keywords"""
-        text_lower = text.lower()
-        
-        found_positive = []
-        found_negative = []
+    def analyze(self, text: str, matches: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Analyze text for positive/negative keywords (from find_matches(text) if given)"""
+        if matches is None:
+            matched = set(index for _, _, index in self._automaton.find_all(self._lower(text)))
+        else:
+            matched = set(match['index'] for match in matches)
         
-        for word in self.positive_words:
-            if word.lower() in text_lower:
-                found_positive.append(word)
-        
-        for word in self.negative_words:
-            if word.lower() in text_lower:
-                found_negative.append(word)
+        # Keep lexicon order, each keyword once
+        found_positive = [w for i, w in enumerate(self.positive_words) if i in matched]
+        found_negative = [
+            w for i, w in enumerate(self.negative_words)
+            if i + self._num_positive in matched
+        ]
         
         return {
             'positive_keywords': found_positive,
@@ -82,7 +246,11 @@ class NgramAnalyzer:
     
     def extract_ngrams(self, texts: List[str], n: int = 2, top_k: int = 15) -> List[Dict[str, Any]]:
         """Extract top n-grams from list of texts"""
-        all_ngrams = []
+        return self.top_ngrams(self.count_ngrams(texts, n), top_k)
+
+    def count_ngrams(self, texts: List[str], n: int, counter: Optional[Counter] = None) -> Counter:
+        """Count n-grams of texts (into `counter` if given, for running totals)"""
+        counter = Counter() if counter is None else counter
         
         for text in texts:
             # Tokenize
@@ -91,15 +259,13 @@ class NgramAnalyzer:
             words = [w for w in words if w.lower() not in self.stopwords and len(w) > 1]
             
             # Generate n-grams
-            for i in range(len(words) - n + 1):
-                ngram = ' '.join(words[i:i+n])
-                all_ngrams.append(ngram)
+            counter.update(' '.join(words[i:i+n]) for i in range(len(words) - n + 1))
         
-        # Count and get top k
-        counter = Counter(all_ngrams)
-        top_ngrams = counter.most_common(top_k)
-        
-        return [{'ngram': ngram, 'count': count} for ngram, count in top_ngrams]
+        return counter
+
+    @staticmethod
+    def top_ngrams(counter: Counter, top_k: int) -> List[Dict[str, Any]]:
+        return [{'ngram': ngram, 'count': count} for ngram, count in counter.most_common(top_k)]
     
     def _tokenize(self, text: str) -> List[str]:
         """Simple tokenization for Vietnamese"""
@@ -115,14 +281,230 @@ class NgramAnalyzer:
             'trigrams': self.extract_ngrams([text], n=3, top_k=10)
         }
     
+    # (name, n, top_k) reported for a batch
+    BATCH_NGRAMS = (('unigrams', 1, 15), ('bigrams', 2, 15), ('trigrams', 3, 10))
+
     def analyze_batch(self, texts: List[str]) -> Dict[str, List[Dict[str, Any]]]:
         """Analyze batch of texts for n-grams"""
         return {
-            'unigrams': self.extract_ngrams(texts, n=1, top_k=15),
-            'bigrams': self.extract_ngrams(texts, n=2, top_k=15),
-            'trigrams': self.extract_ngrams(texts, n=3, top_k=10)
+            name: self.extract_ngrams(texts, n=n, top_k=top_k)
+            for name, n, top_k in self.BATCH_NGRAMS
+        }
+
+
+class BatchAnalysis:
+    """
+    Running aggregates (n-grams, keyword frequency, ratings, inference stats)
+    for a batch that is predicted chunk by chunk.
+    """
+
+    def __init__(self, ngram_analyzer: NgramAnalyzer, keyword_analyzer: KeywordAnalyzer):
+        self.ngram_analyzer = ngram_analyzer
+        self.keyword_analyzer = keyword_analyzer
+        self.ngram_counts = {name: Counter() for name, _, _ in NgramAnalyzer.BATCH_NGRAMS}
+        self.positive_counts: Counter = Counter()
+        self.negative_counts: Counter = Counter()
+        self.rating_counts: Counter = Counter()
+        self.confidence_sum = 0.0
+        self.total = 0
+        self.inference_stats: Dict[str, Any] = {}
+
+    def add(self, texts: List[str], predictions: List[Dict[str, Any]], stats: Optional[Dict[str, Any]] = None):
+        """Fold one chunk of texts and their predictions into the totals"""
+        for name, n, _ in NgramAnalyzer.BATCH_NGRAMS:
+            self.ngram_analyzer.count_ngrams(texts, n, self.ngram_counts[name])
+        for text in texts:
+            kw = self.keyword_analyzer.analyze(text)
+            self.positive_counts.update(kw['positive_keywords'])
+            self.negative_counts.update(kw['negative_keywords'])
+        self.rating_counts.update(p['rating'] for p in predictions)
+        self.confidence_sum += sum(p['confidence'] for p in predictions)
+        self.total += len(predictions)
+        if stats:
+            self._add_stats(stats)
+
+    def _add_stats(self, stats: Dict[str, Any]):
+        totals = self.inference_stats
+        # Padding efficiency averaged over forward passes
+        batches = totals.get('num_batches', 0) + stats.get('num_batches', 0)
+        if batches:
+            totals['padding_efficiency'] = round(
+                (totals.get('padding_efficiency', 1.0) * totals.get('num_batches', 0)
+                 + stats.get('padding_efficiency', 1.0) * stats.get('num_batches', 0)) / batches, 4
+            )
+        else:
+            totals.setdefault('padding_efficiency', 1.0)
+        for key in ('num_batches', 'cache_hits', 'unique_inferred', 'preprocess_seconds', 'inference_seconds'):
+            if key in stats:
+                totals[key] = round(totals.get(key, 0) + stats[key], 3)
+        totals['chunks'] = totals.get('chunks', 0) + 1
+
+    @property
+    def ngrams(self) -> Dict[str, List[Dict[str, Any]]]:
+        return {
+            name: NgramAnalyzer.top_ngrams(self.ngram_counts[name], top_k)
+            for name, _, top_k in NgramAnalyzer.BATCH_NGRAMS
         }
 
+    @property
+    def keyword_frequency(self) -> Dict[str, List[Dict[str, Any]]]:
+        return {
+            'positive': [{'word': w, 'count': c} for w, c in self.positive_counts.most_common(10)],
+            'negative': [{'word': w, 'count': c} for w, c in self.negative_counts.most_common(10)]
+        }
+
+    @property
+    def rating_distribution(self) -> Dict[int, int]:
+        """{rating: count} for ratings 1-5"""
+        return {rating: self.rating_counts.get(rating, 0) for rating in range(1, 6)}
+
+    @property
+    def average_rating(self) -> Optional[float]:
+        if not self.total:
+            return None
+        return sum(rating * count for rating, count in self.rating_counts.items()) / self.total
+
+    @property
+    def average_confidence(self) -> Optional[float]:
+        return self.confidence_sum / self.total if self.total else None
+
+    @property
+    def ratings(self) -> List[int]:
+        """All predicted ratings (order not preserved)"""
+        return list(self.rating_counts.elements())
+
+
+def _hf_local_first(load, *args, **kwargs):
+    """Try the local Hugging Face cache first, so cached artifacts need no network I/O"""
+    try:
+        return load(*args, local_files_only=True, **kwargs)
+    except Exception:
+        return load(*args, **kwargs)
+
+
+def _torch_qscheme(name: str):
+    """Rebuild a torch.qscheme saved by name in the int8 model cache"""
+    import torch
+
+    qscheme = getattr(torch, name, None)
+    if not isinstance(qscheme, torch.qscheme):
+        raise ValueError(f"Not a torch.qscheme: {name}")
+    return qscheme
+
+
+class ModelLoadError(RuntimeError):
+    """Raised when the model could not be loaded (retryable)"""
+
+
+class _LoadFlight:
+    """One in-progress model load that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+class LengthBucketScheduler:
+    """
+    Groups encoded comments into micro-batches by token count.
+    Comments are sorted by length so each batch is padded to a similar size,
+    and a batch is closed once its padded size would exceed the token budget.
+    """
+
+    def __init__(self, max_tokens: int = ML_MAX_BATCH_TOKENS, max_batch_size: int = ML_BATCH_SIZE):
+        self.max_tokens = max_tokens
+        self.max_batch_size = max_batch_size
+
+    def schedule(self, lengths: List[int]) -> List[List[int]]:
+        """Return batches as lists of original indices (shortest first)"""
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+
+        batches = []
+        current: List[int] = []
+        for idx in order:
+            # Lengths are ascending, so the new item sets the padded width
+            padded_size = (len(current) + 1) * lengths[idx]
+            if current and (padded_size > self.max_tokens or len(current) >= self.max_batch_size):
+                batches.append(current)
+                current = []
+            current.append(idx)
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    def padding_efficiency(lengths: List[int], batches: List[List[int]]) -> float:
+        """Share of real (non-pad) tokens among all tokens fed to the model"""
+        real_tokens = sum(lengths)
+        padded_tokens = sum(len(batch) * max(lengths[i] for i in batch) for batch in batches)
+        return real_tokens / padded_tokens if padded_tokens else 1.0
+
+
+class InferenceBackend:
+    """
+    Runs the classifier on one padded batch.
+    `tensor_type` is what the tokenizer should return for this backend.
+    """
+    name = "base"
+    tensor_type = "np"
+
+    def predict(self, encoded: Dict[str, Any]) -> Tuple[List[int], List[float]]:
+        """Return (predicted 0-based class, confidence) per row"""
+        raise NotImplementedError
+
+
+class TorchBackend(InferenceBackend):
+    """Eager PyTorch (fp32 or dynamic int8)"""
+    name = "torch"
+    tensor_type = "pt"
+
+    def __init__(self, model, device: str):
+        self.model = model
+        self.device = device
+
+    def predict(self, encoded: Dict[str, Any]) -> Tuple[List[int], List[float]]:
+        import torch
+        import torch.nn.functional as F
+
+        # Move tensors to device
+        encoded = {k: v.to(self.device) for k, v in encoded.items()}
+
+        with torch.inference_mode():
+            logits = self.model(**encoded).logits
+            probs = F.softmax(logits, dim=1)
+            confidences, predicted_classes = torch.max(probs, dim=1)
+        return predicted_classes.tolist(), confidences.tolist()
+
+
+class OnnxBackend(InferenceBackend):
+    """ONNX Runtime CPU session over the exported classifier (no torch needed)"""
+    name = "onnx"
+    tensor_type = "np"
+
+    def __init__(self, onnx_path: Path, num_threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            str(onnx_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def predict(self, encoded: Dict[str, Any]) -> Tuple[List[int], List[float]]:
+        feeds = {name: np.asarray(encoded[name], dtype=np.int64) for name in self.input_names}
+        logits = self.session.run(["logits"], feeds)[0]
+
+        # Numerically stable softmax
+        logits = logits - logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+        predicted_classes = probs.argmax(axis=1)
+        confidences = probs[np.arange(len(probs)), predicted_classes]
+        return predicted_classes.tolist(), confidences.tolist()
+
 
 class MLPredictionService:
     """
@@ -131,50 +513,333 @@ class MLPredictionService:
     to bypass the 1GB limit of Space Git Repo.
     """
 
-    def __init__(self):
+    def __init__(self, quantize: Optional[bool] = None, backend: Optional[str] = None):
         """Initialize service without loading model (lazy loading)"""
+        # Inference engine: "torch" (default) or "onnx"
+        self.backend_name = (backend or ML_BACKEND).lower()
+        self.backend: Optional[InferenceBackend] = None
+        
+        # Inference precision: int8 dynamic quantization on CPU if enabled
+        self.quantize = ML_QUANTIZE if quantize is None else quantize
+        self.quantized = False
+        
         # Model components
         self.model: Optional[Any] = None
         self.tokenizer: Optional[Any] = None
         self.device: Optional[str] = None
         self.model_loaded = False
         
+        # Loading state (reported by /ready)
+        self._load_lock = threading.Lock()
+        self._load_flight: Optional[_LoadFlight] = None
+        self.load_error: Optional[str] = None
+        self.load_stage = "not_loaded"
+        self.load_progress = 0.0
+        self.warmed_up = False
+        
+        # Offline artifact bundle (ML_BUNDLE_DIR), verified in the background after load
+        self.bundle: Optional[ModelBundle] = None
+        self._bundle_failed_verification = False
+        self._weights_id: Optional[str] = None
+        
         # [SỬA ĐỔI] Không set đường dẫn cứng ở đây nữa vì file không còn ở máy
         # Chúng ta sẽ định nghĩa Repo ID chứa model ở đây
         self.MODEL_REPO_ID = "vtdung23/my-phobert-models"
         self.MODEL_FILENAME = "best_phoBER.pth"
         
         # Initialize analyzers
-        self.keyword_analyzer = KeywordAnalyzer()
+        self.keyword_analyzer = KeywordAnalyzer(ML_KEYWORD_LEXICON or None)
         self.ngram_analyzer = NgramAnalyzer()
+        self.batch_scheduler = LengthBucketScheduler()
+        self.cache = create_prediction_cache()
+
+        # Model-grounded explanations, cached per comment
+        self.attribution = AttributionEngine(
+            method=ML_EXPLAIN_METHOD,
+            ig_steps=ML_EXPLAIN_IG_STEPS,
+            budget_ms=ML_EXPLAIN_BUDGET_MS
+        )
+        self.explanation_cache = PredictionCache(max_size=ML_EXPLAIN_CACHE_SIZE, ttl=ML_CACHE_TTL)
+        self.segmenter = VietnameseSegmenter(
+            cache_size=ML_SEGMENT_CACHE_SIZE,
+            workers=ML_SEGMENT_WORKERS,
+            parallel_min=ML_SEGMENT_PARALLEL_MIN
+        )
         
         print("✅ ML Service initialized (Model will download & load on first request)")
 
     
+    def _set_stage(self, stage: str, progress: float):
+        self.load_stage = stage
+        self.load_progress = progress
+
     def _load_model(self):
-        """Load model and tokenizer (called on first request)"""
+        """
+        Load model and tokenizer (called on first request or at startup).
+        Single-flight: the first caller loads, concurrent callers wait for it
+        and share its outcome. A failed load leaves the service unloaded so
+        the next call retries.
+        """
         if self.model_loaded:
             return
         
-        print("🔄 Loading ML model (first request)...")
+        with self._load_lock:
+            if self.model_loaded:
+                return
+            flight = self._load_flight
+            is_leader = flight is None
+            if is_leader:
+                flight = self._load_flight = _LoadFlight()
+
+        if not is_leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise ModelLoadError(f"Model failed to load: {flight.error}") from flight.error
+            return
+
+        try:
+            self._load_model_once()
+        except Exception as e:
+            flight.error = e
+            self.load_error = str(e)
+            self._set_stage("failed", 0.0)
+            print(f"❌ Model load failed (will retry on next request): {e}")
+            raise ModelLoadError(f"Model failed to load: {e}") from e
+        finally:
+            with self._load_lock:
+                self._load_flight = None
+            flight.done.set()
+
+    def _load_model_once(self):
+        """Build tokenizer + model and publish them only when both are complete"""
+        print("🔄 Loading ML model...")
+        self.load_error = None
+        self._set_stage("loading_tokenizer", 0.05)
         
         # Import heavy dependencies only when needed
-        import torch
-        from transformers import AutoTokenizer, RobertaForSequenceClassification
-        
-        # Determine device
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        print(f"📍 Using device: {self.device}")
+        from transformers import AutoTokenizer
         
         # [SỬA ĐỔI 1] Load Tokenizer từ gốc vinai/phobert-base
         # Vì folder tokenizer local đã bị xóa, ta load thẳng từ thư viện gốc cho an toàn
-        print("📦 Loading tokenizer from vinai/phobert-base...")
-        self.tokenizer = AutoTokenizer.from_pretrained("vinai/phobert-base", use_fast=False)
+        if ML_BUNDLE_DIR:
+            self.bundle = self._open_bundle()
+            self._set_weights_id(self._bundle_weights_id(self.bundle))
+            tokenizer_dir = self.bundle.tokenizer_dir
+            print(f"📦 Loading tokenizer from bundle {self.bundle.version}...")
+            tokenizer = AutoTokenizer.from_pretrained(tokenizer_dir, use_fast=False)
+        else:
+            tokenizer_dir = DEFAULT_TOKENIZER_DIR
+            print("📦 Loading tokenizer from vinai/phobert-base...")
+            tokenizer = _hf_local_first(AutoTokenizer.from_pretrained, "vinai/phobert-base", use_fast=False)
+        if ML_FAST_TOKENIZER:
+            tokenizer = self._load_fast_tokenizer(tokenizer_dir, tokenizer)
+        
+        model = None
+        quantize = False
+        if self.backend_name == "onnx":
+            device = "cpu"
+            backend = self._load_onnx_backend()
+        else:
+            # Determine device
+            device = self._select_device()
+            print(f"📍 Using device: {device}")
+            
+            quantize = self._effective_quantize(device)
+            if self.quantize and not quantize:
+                print("⚠️ Int8 quantization is CPU-only, using fp32 on GPU")
+            
+            quantized_path = self._quantized_model_path()
+            if quantize and quantized_path is not None and quantized_path.exists():
+                # Reuse the int8 weights quantized on a previous boot
+                self._set_stage("loading_quantized_model", 0.5)
+                model = self._load_quantized_model(quantized_path)
+            if model is None:
+                model = self._build_model(device)
+                if quantize:
+                    self._set_stage("quantizing", 0.8)
+                    # Known now that the weights are downloaded
+                    model = self._quantize_model(model, self._quantized_model_path())
+            self.attribution.prepare(model)
+            backend = TorchBackend(model, device)
+        
+        # Publish (model_loaded last: readers check it without the lock)
+        self.quantized = quantize
+        self.device = device
+        self.tokenizer = tokenizer
+        self.model = model
+        self.backend = backend
+        self.model_loaded = True
+        self._set_stage("loaded", 0.9)
+        print(f"✅ Model loaded successfully ({backend.name} backend) and ready to serve!")
         
+        if self.bundle is not None and self.bundle.verified is None:
+            self.bundle.verify_in_background(self._on_bundle_corrupt)
+
+    @staticmethod
+    def _load_fast_tokenizer(tokenizer_dir: Path, slow_tokenizer):
+        """
+        Rust-backed tokenizer built from vocab.txt/bpe.codes. It is only used if
+        it reproduces the slow tokenizer's input_ids on a Vietnamese sample.
+        """
+        try:
+            from app.services.phobert_fast_tokenizer import (
+                load_fast_tokenizer, find_mismatches, PARITY_CORPUS
+            )
+
+            fast_tokenizer = load_fast_tokenizer(tokenizer_dir)
+            mismatches = find_mismatches(fast_tokenizer, slow_tokenizer, PARITY_CORPUS, ML_MAX_LENGTH)
+        except Exception as e:
+            print(f"⚠️ Fast tokenizer unavailable, using slow tokenizer: {e}")
+            return slow_tokenizer
+
+        if mismatches:
+            print(f"⚠️ Fast tokenizer differs on {len(mismatches)} sample(s), using slow tokenizer")
+            return slow_tokenizer
+        print("⚡ Using fast (Rust) PhoBERT tokenizer")
+        return fast_tokenizer
+
+    def _open_bundle(self) -> ModelBundle:
+        """
+        Open ML_BUNDLE_DIR with a cheap size check. Checksums are verified in the
+        background after load, or up front if a previous verification failed.
+        """
+        bundle = ModelBundle(Path(ML_BUNDLE_DIR))
+        bundle.check_files()
+        if self._bundle_failed_verification:
+            bundle.verify()
+            self._bundle_failed_verification = False
+        return bundle
+
+    def _on_bundle_corrupt(self, error: Exception):
+        """Stop serving from a bundle that failed its checksum; next request reloads"""
+        with self._load_lock:
+            self._bundle_failed_verification = True
+            self.model_loaded = False
+            self.load_error = str(error)
+            self._set_stage("failed", 0.0)
+
+    def _build_model(self, device: str):
+        """Download fine-tuned weights and load them into a fp32 PhoBERT"""
+        import torch
+
+        # Memory-mapped weights: reuse the converted checkpoint without downloading
+        use_mmap = ML_MMAP_WEIGHTS and device == "cpu"
+        mmap_path = self._mmap_weights_path()
+        model_path = None
+        if not (use_mmap and mmap_path is not None and mmap_path.exists()):
+            model_path = self._weights_path()
+            mmap_path = self._mmap_weights_path()
+
+        # Load model architecture
+        # (a bundle always builds from its own config: it must not touch the Hub)
+        fast_load = ML_FAST_LOAD or self.bundle is not None
+        self._set_stage("building_architecture", 0.5)
+        if fast_load:
+            # Config only: no pretrained download, no random init, no allocation
+            print("🧠 Building PhoBERT architecture from config (meta device)...")
+            model = self._build_empty_model()
+        else:
+            from transformers import RobertaForSequenceClassification
+            print("🧠 Loading PhoBERT architecture...")
+            model = RobertaForSequenceClassification.from_pretrained(
+                "vinai/phobert-base",
+                num_labels=5, # Đảm bảo số này khớp với lúc bạn train (0,1,2,3,4 hay 1-5?)
+                problem_type="single_label_classification"
+            )
+        
+        # Load fine-tuned weights
+        self._set_stage("loading_weights", 0.7)
+        print("⚙️ Loading trained weights into architecture...")
+        if use_mmap and mmap_path is not None:
+            state_dict = self._mmap_state_dict(model_path, mmap_path)
+        else:
+            state_dict = torch.load(
+                model_path,
+                map_location="cpu" if fast_load else device,
+                weights_only=False
+            )
+        # assign=True adopts the loaded tensors instead of copying into existing ones
+        # (required for meta-device models, and keeps mmap-backed pages shared)
+        model.load_state_dict(state_dict, assign=fast_load or use_mmap)
+        del state_dict
+        if fast_load:
+            self._materialize_buffers(model)
+        
+        # Set to evaluation mode and move to device
+        model.eval()
+        model.to(device)
+        return model
+
+    def _load_config(self):
+        """PhoBERT classifier config, stored under ML_ARTIFACT_DIR for offline boots"""
+        from transformers import AutoConfig
+
+        if self.bundle is not None:
+            return AutoConfig.from_pretrained(self.bundle.config_dir)
+
+        config_dir = ML_ARTIFACT_DIR / "phobert_config"
+        if (config_dir / "config.json").exists():
+            return AutoConfig.from_pretrained(config_dir)
+
+        config = _hf_local_first(
+            AutoConfig.from_pretrained,
+            "vinai/phobert-base",
+            num_labels=5,
+            problem_type="single_label_classification"
+        )
+        try:
+            config.save_pretrained(config_dir)
+        except OSError as e:
+            print(f"⚠️ Could not cache model config: {e}")
+        return config
+
+    def _build_empty_model(self):
+        """Instantiate the architecture on the meta device (weights come from the checkpoint)"""
+        import torch
+        from transformers import RobertaForSequenceClassification
+
+        config = self._load_config()
+        with torch.device("meta"):
+            return RobertaForSequenceClassification(config)
+
+    @staticmethod
+    def _materialize_buffers(model, reset: bool = False):
+        """
+        Non-persistent buffers are not in the checkpoint, so after a meta-device
+        build (or to_empty(), with reset=True) they hold no values. Recreate the
+        ones RoBERTa embeddings use.
+        """
+        import torch
+
+        max_positions = model.config.max_position_embeddings
+        persistent = set(model.state_dict())
+        for name, buffer in list(model.named_buffers()):
+            if not (buffer.is_meta or (reset and name not in persistent)):
+                continue
+            module_name, _, buffer_name = name.rpartition(".")
+            module = model.get_submodule(module_name)
+            if buffer_name == "position_ids":
+                value = torch.arange(max_positions).expand((1, -1))
+            elif buffer_name == "token_type_ids":
+                value = torch.zeros((1, max_positions), dtype=torch.long)
+            else:
+                raise RuntimeError(f"Buffer '{name}' is missing from the checkpoint")
+            module.register_buffer(buffer_name, value, persistent=False)
+
+    def _weights_path(self) -> str:
+        """Fine-tuned checkpoint: from the bundle if configured, else the model repo"""
+        if self.bundle is not None:
+            return str(self.bundle.weights_path)
+        return self._download_weights()
+
+    def _download_weights(self) -> str:
+        """Fetch the fine-tuned checkpoint from the model repo (HF cache first)"""
         # [SỬA ĐỔI 2] Tải file weights từ Kho Model riêng về
+        self._set_stage("downloading_weights", 0.15)
         print(f"⬇️ Downloading weights from repo: {self.MODEL_REPO_ID}...")
         try:
-            model_path = hf_hub_download(
+            model_path = _hf_local_first(
+                hf_hub_download,
                 repo_id=self.MODEL_REPO_ID,
                 filename=self.MODEL_FILENAME,
                 repo_type="model" # Quan trọng: báo đây là kho Model
@@ -183,79 +848,400 @@ class MLPredictionService:
         except Exception as e:
             print(f"❌ Error downloading model: {e}")
             raise e
+        self._set_weights_id(self._checkpoint_id(model_path))
+        return model_path
 
-        # Load model architecture
-        print("🧠 Loading PhoBERT architecture...")
-        self.model = RobertaForSequenceClassification.from_pretrained(
-            "vinai/phobert-base",
-            num_labels=5, # Đảm bảo số này khớp với lúc bạn train (0,1,2,3,4 hay 1-5?)
-            problem_type="single_label_classification"
-        )
-        
-        # Load fine-tuned weights
-        print("⚙️ Loading trained weights into architecture...")
-        state_dict = torch.load(model_path, map_location=self.device, weights_only=False)
-        self.model.load_state_dict(state_dict)
-        
-        # Set to evaluation mode and move to device
-        self.model.eval()
-        self.model.to(self.device)
-        
-        self.model_loaded = True
-        print("✅ Model loaded successfully and ready to serve!")
+    @property
+    def weights_id(self) -> Optional[str]:
+        """
+        Identifier of the fine-tuned checkpoint: bundle version plus the
+        weights SHA-256 from its manifest, or the model repo commit. Derived
+        artifacts (mmap, int8, ONNX) and cache keys are named after it, so a
+        new checkpoint never reuses anything built from the old one.
+        Before the load it is read from local files only; None means it is
+        not known until the weights are downloaded.
+        """
+        if self._weights_id is None:
+            weights_id = self._local_weights_id()
+            if weights_id is not None:
+                self._set_weights_id(weights_id)
+        return self._weights_id
+
+    def _set_weights_id(self, weights_id: str):
+        self._weights_id = re.sub(r"[^\w.-]", "_", weights_id)
+
+    def _local_weights_id(self) -> Optional[str]:
+        """Checkpoint id from the bundle manifest or the HF cache (no network I/O)"""
+        if ML_BUNDLE_DIR:
+            try:
+                return self._bundle_weights_id(self.bundle or ModelBundle(Path(ML_BUNDLE_DIR)))
+            except ModelLoadError:
+                return None  # reported by the load
+        cached = try_to_load_from_cache(self.MODEL_REPO_ID, self.MODEL_FILENAME)
+        return self._checkpoint_id(cached) if isinstance(cached, str) else None
+
+    @staticmethod
+    def _bundle_weights_id(bundle: ModelBundle) -> str:
+        try:
+            weights_sha = bundle.manifest["files"][bundle.manifest["weights"]]["sha256"]
+        except Exception as e:
+            raise ModelLoadError(f"Model bundle unreadable: {e}") from e
+        return f"bundle-{bundle.version}-{weights_sha[:12]}"
+
+    @staticmethod
+    def _checkpoint_id(model_path: str) -> str:
+        """Repo commit of a file in the HF cache (snapshots/<commit>/...), else its SHA-256"""
+        path = Path(model_path)
+        if path.parent.parent.name == "snapshots":
+            return f"rev-{path.parent.name[:12]}"
+        return f"sha-{sha256_file(path)[:12]}"
+
+    def _artifact_path(self, suffix: str) -> Optional[Path]:
+        """
+        Derived artifact of the current checkpoint under ML_ARTIFACT_DIR
+        (None while the checkpoint is not identified: nothing is read or written)
+        """
+        if self.weights_id is None:
+            return None
+        stem = Path(self.MODEL_FILENAME).stem
+        return ML_ARTIFACT_DIR / f"{stem}.{self.weights_id}{suffix}"
+
+    def _mmap_weights_path(self) -> Optional[Path]:
+        return self._artifact_path(".mmap.pt")
+
+    def _mmap_state_dict(self, model_path: Optional[str], mmap_path: Path) -> Dict[str, Any]:
+        """
+        Open a memory-mapped copy of the checkpoint.
+        Pages are mapped read-only/copy-on-write, so every worker process
+        that loads the same file shares one copy of the weights in RAM.
+        """
+        import torch
+
+        if not mmap_path.exists():
+            # One-time conversion to torch's zipfile format, which supports mmap.
+            # Written under a per-process temp name so concurrent workers don't clash.
+            print(f"🔁 Converting checkpoint for memory mapping: {mmap_path}...")
+            state_dict = torch.load(model_path, map_location="cpu", weights_only=False)
+            state_dict = {k: v.contiguous() for k, v in state_dict.items()}
+            mmap_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = mmap_path.with_suffix(f".{os.getpid()}.tmp")
+            torch.save(state_dict, tmp_path)
+            os.replace(tmp_path, mmap_path)
+            del state_dict
+
+        print(f"🗺️ Memory-mapping weights from {mmap_path}...")
+        return torch.load(mmap_path, map_location="cpu", mmap=True, weights_only=True)
+
+    def _quantized_model_path(self) -> Optional[Path]:
+        # Packed int8 weights are a torch-internal format and the module layout
+        # is transformers', so either upgrade starts a new file
+        import torch
+        import transformers
+
+        versions = re.sub(r"[^\w.-]", "_", f"torch-{torch.__version__}.transformers-{transformers.__version__}")
+        return self._artifact_path(f".{versions}.int8.pt")
+
+    @staticmethod
+    def _quantize_dynamic(model):
+        import torch
+
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def _quantize_model(self, model, save_path: Optional[Path] = None):
+        """Dynamic int8 quantization of all Linear layers (CPU inference)"""
+        import torch
+
+        print("⚡ Quantizing Linear layers to int8...")
+        quantized = self._quantize_dynamic(model)
+        quantized.eval()
+
+        if save_path is not None:
+            tmp_path = save_path.with_suffix(".tmp")
+            try:
+                save_path.parent.mkdir(parents=True, exist_ok=True)
+                torch.save(quantized.state_dict(), tmp_path, pickle_module=self._int8_pickle_module())
+                os.replace(tmp_path, save_path)
+                print(f"💾 Saved int8 model to {save_path}")
+            except Exception as e:
+                # The cache is an optimization: serve the in-memory model regardless
+                tmp_path.unlink(missing_ok=True)
+                print(f"⚠️ Could not cache int8 model: {e}")
+        return quantized
+
+    def _load_quantized_model(self, path: Path):
+        """
+        Rebuild the int8 model from cached weights: empty architecture, same
+        quantization, then the saved state_dict (weights_only). Returns None,
+        and deletes the file, if it cannot be loaded.
+        """
+        import torch
+
+        print(f"⚡ Loading cached int8 model from {path}...")
+        try:
+            model = self._build_empty_model()
+            model.to_empty(device="cpu")
+            with torch.no_grad():
+                for param in model.parameters():
+                    param.zero_()  # quantized below, then overwritten by the state_dict
+            model = self._quantize_dynamic(model)
+            with torch.serialization.safe_globals([_torch_qscheme]):
+                state_dict = torch.load(path, map_location="cpu", weights_only=True)
+            model.load_state_dict(state_dict)
+            self._materialize_buffers(model, reset=True)
+        except Exception as e:
+            print(f"⚠️ Cached int8 model unusable, quantizing again: {e}")
+            path.unlink(missing_ok=True)
+            return None
+        model.eval()
+        return model
+
+    @staticmethod
+    def _int8_pickle_module():
+        """
+        pickle with torch.qscheme values (scale/zero-point schemes of the int8
+        weights) saved by name. They have no __module__, so plain pickle
+        searches sys.modules for them, and transformers' lazy module then
+        imports every model it knows (failing without e.g. torchvision).
+        _load_quantized_model allowlists _torch_qscheme for weights_only loads.
+        """
+        import pickle
+        import types
+        import torch
+
+        class Pickler(pickle.Pickler):
+            def reducer_override(self, obj):
+                if isinstance(obj, torch.qscheme):
+                    return _torch_qscheme, (str(obj).rpartition(".")[2],)
+                return NotImplemented
+
+        module = types.ModuleType("int8_pickle")
+        module.Pickler = Pickler
+        return module
+
+    def _onnx_model_path(self) -> Optional[Path]:
+        return self._artifact_path(".onnx")
+
+    def _load_onnx_backend(self) -> OnnxBackend:
+        """Open the cached ONNX graph, exporting it from the PyTorch model on first use"""
+        onnx_path = self._onnx_model_path()
+        if onnx_path is None or not onnx_path.exists():
+            model = self._build_model("cpu")
+            # Known now that the weights are downloaded
+            onnx_path = self._onnx_model_path()
+            self._set_stage("exporting_onnx", 0.8)
+            self._export_onnx(model, onnx_path)
+            del model
+
+        self._set_stage("loading_onnx", 0.85)
+        print(f"⚡ Loading ONNX Runtime session from {onnx_path}...")
+        return OnnxBackend(onnx_path, ML_ONNX_THREADS)
+
+    def _export_onnx(self, model, onnx_path: Path):
+        """
+        Export the classifier with dynamic batch and sequence axes and check it
+        against PyTorch before publishing it to onnx_path
+        """
+        import tempfile
+        import torch
+
+        class _LogitsOnly(torch.nn.Module):
+            def __init__(self, wrapped):
+                super().__init__()
+                self.wrapped = wrapped
+
+            def forward(self, input_ids, attention_mask):
+                return self.wrapped(input_ids=input_ids, attention_mask=attention_mask).logits
+
+        print(f"📤 Exporting model to ONNX: {onnx_path}...")
+        onnx_path.parent.mkdir(parents=True, exist_ok=True)
+        wrapper = _LogitsOnly(model).eval()
+        # Two rows, one padded, as separate tensors: the exporter aliases a
+        # tensor passed for both inputs, and the padding path must be traced
+        pad_id = model.config.pad_token_id
+        input_ids = torch.tensor([
+            [0, 5, 6, 7, 8, 9, 10, 2],
+            [0, 11, 12, 2, pad_id, pad_id, pad_id, pad_id]
+        ], dtype=torch.long)
+        attention_mask = (input_ids != pad_id).long()
+
+        # Export under the final name in a scratch directory, so weight files
+        # written next to the graph (external data) keep the names it refers to
+        with tempfile.TemporaryDirectory(dir=onnx_path.parent) as tmp_dir:
+            tmp_path = Path(tmp_dir) / onnx_path.name
+            with torch.no_grad():
+                torch.onnx.export(
+                    wrapper,
+                    (input_ids, attention_mask),
+                    str(tmp_path),
+                    input_names=["input_ids", "attention_mask"],
+                    output_names=["logits"],
+                    dynamic_axes={
+                        "input_ids": {0: "batch", 1: "sequence"},
+                        "attention_mask": {0: "batch", 1: "sequence"},
+                        "logits": {0: "batch"}
+                    },
+                    opset_version=14
+                )
+                expected = wrapper(input_ids, attention_mask).numpy()
+
+            session = OnnxBackend(tmp_path).session
+            actual = session.run(["logits"], {
+                "input_ids": input_ids.numpy(),
+                "attention_mask": attention_mask.numpy()
+            })[0]
+            if not np.allclose(actual, expected, atol=1e-3):
+                diff = float(np.abs(actual - expected).max())
+                raise RuntimeError(f"ONNX export does not match PyTorch (max logit diff {diff:.4f})")
+            del session
+
+            # Graph last: once onnx_path exists, its weight files are in place
+            for path in sorted(Path(tmp_dir).iterdir(), key=lambda path: path == tmp_path):
+                os.replace(path, onnx_path.parent / path.name)
+
+    def warm_up(self):
+        """
+        Load the model and run dummy passes so the first real request is fast:
+        one underthesea call plus a forward pass per length in ML_WARMUP_LENGTHS.
+        """
+        started = time.perf_counter()
+        self._load_model()
+        self._set_stage("warming_up", 0.9)
+
+        self.preprocess("Sản phẩm rất tốt, giao hàng nhanh")
+
+        for length in ML_WARMUP_LENGTHS:
+            length = max(2, min(length, ML_MAX_LENGTH))
+            input_ids = (
+                [self.tokenizer.bos_token_id]
+                + [self.tokenizer.unk_token_id] * (length - 2)
+                + [self.tokenizer.eos_token_id]
+            )
+            encoded = self.tokenizer.pad(
+                {'input_ids': [input_ids]},
+                return_tensors=self.backend.tensor_type
+            )
+            self._forward(encoded)
+
+        self.warmed_up = True
+        self._set_stage("ready", 1.0)
+        print(f"🔥 Model warmed up in {time.perf_counter() - started:.1f}s")
+
+    def status(self) -> Dict[str, Any]:
+        """Loading state for readiness probes"""
+        return {
+            'ready': self.model_loaded,
+            'stage': self.load_stage,
+            'progress': self.load_progress,
+            'warmed_up': self.warmed_up,
+            'error': self.load_error,
+            'device': self.device,
+            'backend': self.backend_name,
+            'quantized': self.quantized,
+            'model_version': self.model_version,
+            'bundle': self.bundle.version if self.bundle else None,
+            'bundle_verified': self.bundle.verified if self.bundle else None,
+            'segmentation': self.segmenter.stats(),
+            'explanation_method': self.attribution.method,
+            'cache': self.cache.stats(),
+            'explanation_cache': self.explanation_cache.stats()
+        }
             
+    @staticmethod
+    def _select_device() -> str:
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+
+    def _effective_quantize(self, device: Optional[str] = None) -> bool:
+        """Whether int8 is actually used: requested, torch backend and CPU"""
+        if not self.quantize or self.backend_name == "onnx":
+            return False
+        return (device or self._select_device()) == "cpu"
+
+    @property
+    def model_version(self) -> Optional[str]:
+        """
+        Weights, backend and precision in use (part of every cache key).
+        Before the model is loaded the precision is what the load will pick;
+        None while the checkpoint is not identified (see weights_id).
+        """
+        if self.weights_id is None:
+            return None
+        version = f"{self.MODEL_REPO_ID}/{self.MODEL_FILENAME}@{self.weights_id}"
+        # int8 can flip borderline ratings and ONNX Runtime kernels differ
+        # slightly from torch, so each gets its own cache entries
+        quantized = self.quantized if self.model_loaded else self._effective_quantize()
+        return f"{version}|{self.backend_name}|{'int8' if quantized else 'fp32'}"
+
     def predict_single(self, text: str) -> Dict[str, Any]:
         """Predict rating for a single comment"""
+        if self.weights_id is None:
+            # Cache keys name the checkpoint, identified by the load
+            self._load_model()
+        key = comment_key(text, self.model_version)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
         # Lazy load model on first request
         self._load_model()
-        
-        import torch
-        import torch.nn.functional as F
 
         # 1. Vietnamese preprocessing
         processed_text = self.preprocess(text)
 
-        # 2. Tokenize
+        # 2-5. Tokenize, inference, rating + confidence
+        prediction = self._infer_batch([processed_text])[0]
+        self.cache.put(key, prediction, self.model_version)
+        return prediction
+
+    def _infer_batch(self, processed_texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Run one forward pass over already preprocessed texts.
+        Padding is dynamic: each batch is padded to its longest member only.
+        """
+        # Tokenize the whole micro-batch at once
         encoded = self.tokenizer(
-            processed_text,
+            processed_texts,
             padding=True,
             truncation=True,
-            max_length=256,
-            return_tensors="pt"
+            max_length=ML_MAX_LENGTH,
+            return_tensors=self.backend.tensor_type
         )
-        
-        # Move tensors to device
-        encoded = {k: v.to(self.device) for k, v in encoded.items()}
-
-        # 3. Inference
-        with torch.no_grad():
-            outputs = self.model(**encoded)
-            logits = outputs.logits
-            probs = F.softmax(logits, dim=1)
+        return self._forward(encoded)
 
-        # 4. Get prediction + confidence
-        predicted_class = torch.argmax(probs, dim=1).item()
-        confidence = probs[0][predicted_class].item()
+    def _forward(self, encoded: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Forward pass over a padded batch of encoded inputs"""
+        predicted_classes, confidences = self.backend.predict(encoded)
 
-        # 5. Convert 0-based label -> rating 1-5
+        # Convert 0-based label -> rating 1-5
         # (Giả sử model train label 0 tương ứng 1 sao)
-        rating = predicted_class + 1
+        return [
+            {'rating': int(cls) + 1, 'confidence': float(conf)}
+            for cls, conf in zip(predicted_classes, confidences)
+        ]
 
-        return {
-            'rating': rating,
-            'confidence': confidence
-        }
-    
-    def predict_with_explanation(self, text: str) -> Dict[str, Any]:
+    def predict_with_explanation(
+        self,
+        text: str,
+        matches: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
         """
         Predict rating with explanation (word importance scores)
-        Uses keyword-based importance for interpretability (safer than gradients)
+        Uses model attribution (ML_EXPLAIN_METHOD) on the torch backend, cached
+        per comment; keyword-based importance otherwise.
+        `matches` (keyword_analyzer.find_matches(text)) saves a keyword scan.
         """
         # Lazy load model on first request
         self._load_model()
         
-        import torch
-        import torch.nn.functional as F
+        # Get keyword analysis for the full text
+        keyword_analysis = self.keyword_analyzer.analyze(text, matches)
+        
+        use_attribution = self.attribution.method != "keywords" and isinstance(self.backend, TorchBackend)
+        if use_attribution:
+            cache_key = comment_key(text, f"{self.model_version}|{self.attribution.cache_tag}")
+            cached = self.explanation_cache.get(cache_key)
+            if cached is not None:
+                return {**cached, 'keywords': keyword_analysis}
         
         # 1. Vietnamese preprocessing
         processed_text = self.preprocess(text)
@@ -265,126 +1251,259 @@ class MLPredictionService:
             processed_text,
             padding=True,
             truncation=True,
-            max_length=256,
-            return_tensors="pt"
+            max_length=ML_MAX_LENGTH,
+            return_tensors=self.backend.tensor_type
         )
         
-        # Move tensors to device
-        encoded = {k: v.to(self.device) for k, v in encoded.items()}
-        
-        # 3. Standard inference (no gradients needed)
-        with torch.no_grad():
-            outputs = self.model(**encoded)
-            logits = outputs.logits
-            probs = F.softmax(logits, dim=1)
-            
-            # Get predicted class
-            predicted_class = torch.argmax(probs, dim=1).item()
-            confidence = probs[0][predicted_class].item()
-        
-        # 4. Keyword-based importance (more reliable than gradient-based)
-        tokens = self.tokenizer.convert_ids_to_tokens(encoded['input_ids'][0])
+        # 3a. Model-grounded attribution (prediction comes from the same pass)
+        if use_attribution:
+            attribution = self.attribution.attribute(
+                self.backend.model,
+                self.tokenizer,
+                {k: v.to(self.device) for k, v in encoded.items()},
+                gradients=not self.quantized  # dynamic int8 layers have no backward
+            )
+            if attribution is not None:
+                rating = attribution['predicted_class'] + 1
+                result = {
+                    'rating': rating,
+                    'confidence': attribution['confidence'],
+                    'explanation': {
+                        'words': attribution['words'],
+                        'importance_scores': attribution['importance_scores'],
+                        'overall_sentiment': self._overall_sentiment(rating),
+                        'method': attribution['method']
+                    }
+                }
+                self.explanation_cache.put(cache_key, result)
+                return {**result, 'keywords': keyword_analysis}
         
-        # Calculate importance based on keyword presence and position
-        word_importance = []
-        for i, token in enumerate(tokens):
-            if token not in ['<s>', '</s>', '<pad>', '<unk>']:
-                # Clean token (remove BPE markers)
-                clean_token = token.replace('@@', '').replace('▁', '').strip()
-                if not clean_token:
-                    continue
-                    
-                # Check if token is a keyword
-                is_positive = any(kw in clean_token.lower() or clean_token.lower() in kw 
-                                  for kw in self.keyword_analyzer.positive_words)
-                is_negative = any(kw in clean_token.lower() or clean_token.lower() in kw 
-                                  for kw in self.keyword_analyzer.negative_words)
-                
-                # Assign importance score
-                if is_positive:
-                    score = 0.8 + (0.2 * (1 - i / len(tokens)))  # Decay by position
-                elif is_negative:
-                    score = -(0.8 + (0.2 * (1 - i / len(tokens))))
-                else:
-                    # Neutral words get small score based on prediction
-                    score = 0.2 if predicted_class >= 2 else -0.2
-                
-                word_importance.append({
-                    'word': clean_token,
-                    'score': round(score, 3)
-                })
+        # 3b. Standard inference (no gradients needed)
+        prediction = self._forward(encoded)[0]
+        predicted_class = prediction['rating'] - 1
+        confidence = prediction['confidence']
         
+        # 4. Keyword-based importance
         rating = predicted_class + 1
-        
-        # Get keyword analysis for the full text
-        keyword_analysis = self.keyword_analyzer.analyze(text)
+        explanation = self._explain_tokens(encoded['input_ids'][0].tolist(), rating)
         
         return {
             'rating': rating,
             'confidence': confidence,
-            'explanation': {
-                'words': [wi['word'] for wi in word_importance[:20]],
-                'importance_scores': [wi['score'] for wi in word_importance[:20]],
-                'overall_sentiment': 'positive' if rating >= 4 else ('negative' if rating <= 2 else 'neutral')
-            },
+            'explanation': explanation,
             'keywords': keyword_analysis
         }
+
+    @staticmethod
+    def _overall_sentiment(rating: int) -> str:
+        return 'positive' if rating >= 4 else ('negative' if rating <= 2 else 'neutral')
+
+    def _explain_tokens(self, input_ids: List[int], rating: int) -> Dict[str, Any]:
+        """Explanation (ExplanationData shape) for one encoded comment"""
+        tokens = self.tokenizer.convert_ids_to_tokens(input_ids)
+        word_importance = self._token_importance(tokens, rating - 1)
+        return {
+            'words': word_importance['words'][:20],
+            'importance_scores': word_importance['scores'][:20],
+            'overall_sentiment': self._overall_sentiment(rating)
+        }
     
-    def predict_batch(self, texts: List[str]) -> List[Dict[str, any]]:
-        """Predict ratings for multiple comments"""
-        results = []
-        for text in texts:
-            # Có thể tối ưu bằng cách batch tokenize, nhưng loop đơn giản cho an toàn
-            prediction = self.predict_single(text)
-            results.append({
+    def _token_importance(self, tokens: List[str], predicted_class: int) -> Dict[str, List]:
+        """
+        Score tokens by keyword presence and position: keywords get +/-0.8
+        plus up to 0.2 decaying with position, other words +/-0.2 following
+        the predicted sentiment.
+        """
+        words, positions, polarities = [], [], []
+        for i, token in enumerate(tokens):
+            if token in ('<s>', '</s>', '<pad>', '<unk>'):
+                continue
+            # Clean token (remove BPE markers)
+            clean_token = token.replace('@@', '').replace('▁', '').strip()
+            if not clean_token:
+                continue
+            words.append(clean_token)
+            positions.append(i)
+            polarities.append(self.keyword_analyzer.token_polarity(clean_token))
+
+        polarity = np.asarray(polarities, dtype=np.int8)
+        keyword_scores = 0.8 + 0.2 * (1 - np.asarray(positions, dtype=np.float64) / len(tokens))
+        neutral_score = 0.2 if predicted_class >= 2 else -0.2
+        scores = np.where(polarity != 0, polarity * keyword_scores, neutral_score)
+
+        return {'words': words, 'scores': np.round(scores, 3).tolist()}
+
+    def predict_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Predict ratings for multiple comments.
+        Comments are length-bucketed into micro-batches (see LengthBucketScheduler)
+        with one forward pass each; results are returned in input order.
+        """
+        return self._predict_batch_with_stats(texts)[0]
+
+    def predict_batch_with_explanation(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Batch prediction with word importance for every comment.
+        Uses the same batched inference as predict_batch; each row also has
+        an 'explanation' like predict_with_explanation.
+        """
+        return self._predict_batch_with_stats(texts, explain=True)[0]
+
+    def _predict_batch_with_stats(
+        self,
+        texts: List[str],
+        explain: bool = False
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Batch prediction that also reports scheduling statistics"""
+        if not texts:
+            return [], {'num_batches': 0, 'padding_efficiency': 1.0, 'cache_hits': 0, 'unique_inferred': 0}
+
+        if self.weights_id is None:
+            # Cache keys name the checkpoint, identified by the load
+            self._load_model()
+
+        # Resolve cache hits and de-duplicate the rest so each distinct
+        # comment reaches the model once
+        keys = [comment_key(text, self.model_version) for text in texts]
+        unique_keys = list(dict.fromkeys(keys))
+        predictions = self.cache.get_many(unique_keys)
+        cache_hits = len(predictions)
+        pending = {key: text for key, text in zip(keys, texts) if key not in predictions}
+
+        stats = {'num_batches': 0, 'padding_efficiency': 1.0}
+        if explain:
+            # Explanations need the tokens of every distinct comment, cached or not;
+            # only the uncached ones go through the model
+            text_by_key = dict(zip(keys, texts))
+            input_ids, preprocess_seconds = self._encode_texts([text_by_key[key] for key in unique_keys])
+            encoded_by_key = dict(zip(unique_keys, input_ids))
+            if pending:
+                pending_keys = list(pending)
+                inferred, stats = self._infer_encoded([encoded_by_key[key] for key in pending_keys])
+                stats['preprocess_seconds'] = round(preprocess_seconds, 3)
+                predictions.update(zip(pending_keys, inferred))
+                self.cache.put_many(list(zip(pending_keys, inferred)), self.model_version)
+            explanations = {
+                key: self._explain_tokens(ids, predictions[key]['rating'])
+                for key, ids in encoded_by_key.items()
+            }
+        elif pending:
+            pending_keys = list(pending)
+            inferred, stats = self._infer_texts([pending[key] for key in pending_keys])
+            predictions.update(zip(pending_keys, inferred))
+            self.cache.put_many(list(zip(pending_keys, inferred)), self.model_version)
+
+        results = [
+            {
                 'text': text,
-                'rating': prediction['rating'],
-                'confidence': prediction['confidence']
-            })
-        return results
+                'rating': predictions[key]['rating'],
+                'confidence': predictions[key]['confidence']
+            }
+            for key, text in zip(keys, texts)
+        ]
+        if explain:
+            for key, result in zip(keys, results):
+                result['explanation'] = explanations[key]
+
+        stats['cache_hits'] = cache_hits
+        stats['unique_inferred'] = len(pending)
+        return results, stats
+
+    def _infer_texts(self, texts: List[str]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Run the model over raw texts using length-bucketed micro-batches"""
+        input_ids, preprocess_seconds = self._encode_texts(texts)
+        results, stats = self._infer_encoded(input_ids)
+        stats['preprocess_seconds'] = round(preprocess_seconds, 3)
+        return results, stats
+
+    def _encode_texts(self, texts: List[str]) -> Tuple[List[List[int]], float]:
+        """Segment and encode without padding; returns (input_ids, preprocess seconds)"""
+        # Lazy load model on first request
+        self._load_model()
+
+        started = time.perf_counter()
+        processed_texts = self.preprocess_batch(texts)
+        preprocess_seconds = time.perf_counter() - started
+
+        # No padding so real token counts are known
+        input_ids = self.tokenizer(
+            processed_texts,
+            truncation=True,
+            max_length=ML_MAX_LENGTH
+        )['input_ids']
+        return input_ids, preprocess_seconds
+
+    def _infer_encoded(self, input_ids: List[List[int]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Forward passes over length-bucketed micro-batches of encoded comments"""
+        started = time.perf_counter()
+        lengths = [len(ids) for ids in input_ids]
+        batches = self.batch_scheduler.schedule(lengths)
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(input_ids)
+        for batch in batches:
+            encoded = self.tokenizer.pad(
+                {'input_ids': [input_ids[i] for i in batch]},
+                padding=True,
+                return_tensors=self.backend.tensor_type
+            )
+            for idx, prediction in zip(batch, self._forward(encoded)):
+                results[idx] = prediction
+
+        stats = {
+            'num_batches': len(batches),
+            'padding_efficiency': round(self.batch_scheduler.padding_efficiency(lengths, batches), 4),
+            'inference_seconds': round(time.perf_counter() - started, 3)
+        }
+        return results, stats
     
-    def predict_batch_with_analysis(self, texts: List[str]) -> Dict[str, Any]:
+    def predict_batch_with_analysis(self, texts: List[str], include_explanation: bool = False) -> Dict[str, Any]:
         """
         Predict ratings for batch with additional analysis:
         - N-gram analysis
         - Keyword frequency
         - Rating distribution
+        - Word importance per comment (if include_explanation)
         """
-        # Get predictions
-        predictions = self.predict_batch(texts)
-        
-        # N-gram analysis
-        ngram_analysis = self.ngram_analyzer.analyze_batch(texts)
-        
-        # Aggregate keyword analysis
-        all_positive = []
-        all_negative = []
-        for text in texts:
-            kw = self.keyword_analyzer.analyze(text)
-            all_positive.extend(kw['positive_keywords'])
-            all_negative.extend(kw['negative_keywords'])
-        
-        positive_freq = Counter(all_positive).most_common(10)
-        negative_freq = Counter(all_negative).most_common(10)
+        analysis = self.new_batch_analysis()
+        predictions = self.predict_batch_chunk(texts, analysis, include_explanation)
         
         return {
             'predictions': predictions,
-            'ngrams': ngram_analysis,
-            'keyword_frequency': {
-                'positive': [{'word': w, 'count': c} for w, c in positive_freq],
-                'negative': [{'word': w, 'count': c} for w, c in negative_freq]
-            }
+            'ngrams': analysis.ngrams,
+            'keyword_frequency': analysis.keyword_frequency,
+            'inference_stats': analysis.inference_stats
         }
+
+    def new_batch_analysis(self) -> BatchAnalysis:
+        """Running aggregates for a batch predicted in chunks (see predict_batch_chunk)"""
+        return BatchAnalysis(self.ngram_analyzer, self.keyword_analyzer)
+
+    def predict_batch_chunk(
+        self,
+        texts: List[str],
+        analysis: BatchAnalysis,
+        include_explanation: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Predict one chunk of a larger batch and fold it into `analysis`"""
+        predictions, inference_stats = self._predict_batch_with_stats(texts, explain=include_explanation)
+        analysis.add(texts, predictions, inference_stats)
+        # Logged for CSV batches only (micro-batched /single requests also use _predict_batch_with_stats)
+        print(f"📊 Batch inference: {len(texts)} rows, {inference_stats['unique_inferred']} inferred, "
+              f"{inference_stats['cache_hits']} cached, {inference_stats['num_batches']} batches, "
+              f"padding efficiency {inference_stats['padding_efficiency']:.1%}")
+        return predictions
     
     def analyze_ngrams(self, texts: List[str]) -> Dict[str, List[Dict[str, Any]]]:
         """Analyze n-grams for a list of texts"""
         return self.ngram_analyzer.analyze_batch(texts)
     
     def preprocess(self, text: str) -> str:
-        """Preprocess Vietnamese text"""
-        from underthesea import word_tokenize
-        text = word_tokenize(text, format="text")
-        return text
+        """Preprocess Vietnamese text (memoized word segmentation)"""
+        return self.segmenter.segment(text)
+
+    def preprocess_batch(self, texts: List[str]) -> List[str]:
+        """Preprocess many texts; large batches are segmented in parallel"""
+        return self.segmenter.segment_batch(texts)
 
 # Singleton instance
 ml_service = MLPredictionService()
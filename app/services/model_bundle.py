@@ -0,0 +1,193 @@
+"""
+Model Artifact Bundle
+Self-contained, versioned directory with tokenizer, config and weights,
+plus a SHA-256 manifest, so the model can be served with zero network I/O.
+
+Layout:
+    <bundle>/manifest.json
+    <bundle>/tokenizer/...      (PhoBERT vocab.txt, bpe.codes, configs)
+    <bundle>/config/config.json
+    <bundle>/weights/<checkpoint>
+
+CLI:
+    python -m app.services.model_bundle build --version v1 [--weights best_phoBER.pth]
+    python -m app.services.model_bundle verify app/services/Model/bundles/v1
+"""
+import argparse
+import hashlib
+import json
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Callable, Optional
+
+from app.config import BASE_DIR
+
+MANIFEST_NAME = "manifest.json"
+DEFAULT_TOKENIZER_DIR = BASE_DIR / "app" / "services" / "Model" / "phoBERT_multi_class_tokenizer"
+DEFAULT_BUNDLES_DIR = BASE_DIR / "app" / "services" / "Model" / "bundles"
+
+
+class BundleIntegrityError(RuntimeError):
+    """Raised when bundle files are missing or do not match the manifest"""
+
+
+def sha256_file(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelBundle:
+    """Read-only view of a bundle directory"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        manifest_path = self.path / MANIFEST_NAME
+        if not manifest_path.exists():
+            raise BundleIntegrityError(f"No {MANIFEST_NAME} in bundle {self.path}")
+        with open(manifest_path, encoding="utf-8") as f:
+            self.manifest: Dict[str, Any] = json.load(f)
+        self.verified: Optional[bool] = None
+
+    @property
+    def version(self) -> str:
+        return self.manifest["version"]
+
+    @property
+    def tokenizer_dir(self) -> Path:
+        return self.path / "tokenizer"
+
+    @property
+    def config_dir(self) -> Path:
+        return self.path / "config"
+
+    @property
+    def weights_path(self) -> Path:
+        return self.path / self.manifest["weights"]
+
+    def check_files(self):
+        """Cheap check: every manifest file exists with the recorded size"""
+        for rel_path, info in self.manifest["files"].items():
+            path = self.path / rel_path
+            if not path.exists():
+                raise BundleIntegrityError(f"Bundle file missing: {rel_path}")
+            if path.stat().st_size != info["size"]:
+                raise BundleIntegrityError(f"Bundle file has wrong size: {rel_path}")
+
+    def verify(self):
+        """Full check: SHA-256 of every file matches the manifest"""
+        self.check_files()
+        for rel_path, info in self.manifest["files"].items():
+            if sha256_file(self.path / rel_path) != info["sha256"]:
+                self.verified = False
+                raise BundleIntegrityError(f"Checksum mismatch: {rel_path}")
+        self.verified = True
+
+    def verify_in_background(self, on_failure: Callable[[Exception], None]) -> threading.Thread:
+        """Hash files off the request path; on_failure is called on mismatch"""
+        def _run():
+            try:
+                self.verify()
+                print(f"✅ Model bundle {self.version} verified")
+            except Exception as e:
+                print(f"❌ Model bundle {self.version} failed verification: {e}")
+                on_failure(e)
+
+        thread = threading.Thread(target=_run, name="bundle-verify", daemon=True)
+        thread.start()
+        return thread
+
+
+def build_bundle(
+    version: str,
+    weights_path: Path,
+    output_dir: Path = DEFAULT_BUNDLES_DIR,
+    tokenizer_dir: Path = DEFAULT_TOKENIZER_DIR,
+    model_repo_id: str = "",
+    base_model: str = "vinai/phobert-base"
+) -> Path:
+    """Pack tokenizer, config and weights into output_dir/version with a manifest"""
+    from transformers import AutoConfig
+
+    bundle_dir = Path(output_dir) / version
+    if bundle_dir.exists():
+        raise FileExistsError(f"Bundle already exists: {bundle_dir}")
+    tmp_dir = bundle_dir.with_name(f".{version}.tmp")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+
+    shutil.copytree(tokenizer_dir, tmp_dir / "tokenizer")
+
+    config = AutoConfig.from_pretrained(
+        base_model,
+        num_labels=5,
+        problem_type="single_label_classification"
+    )
+    config.save_pretrained(tmp_dir / "config")
+
+    weights_rel = f"weights/{Path(weights_path).name}"
+    (tmp_dir / "weights").mkdir(parents=True)
+    shutil.copy2(weights_path, tmp_dir / weights_rel)
+
+    files = {}
+    for path in sorted(p for p in tmp_dir.rglob("*") if p.is_file()):
+        files[path.relative_to(tmp_dir).as_posix()] = {
+            "sha256": sha256_file(path),
+            "size": path.stat().st_size
+        }
+
+    manifest = {
+        "version": version,
+        "created_at": datetime.utcnow().isoformat(),
+        "model_repo_id": model_repo_id,
+        "base_model": base_model,
+        "weights": weights_rel,
+        "files": files
+    }
+    with open(tmp_dir / MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    tmp_dir.rename(bundle_dir)
+    return bundle_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or verify an offline model bundle")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Create a new bundle version")
+    build.add_argument("--version", required=True, help="Bundle version, e.g. v1 or 2024-06-01")
+    build.add_argument("--weights", help="Fine-tuned checkpoint (default: download from the model repo)")
+    build.add_argument("--output", default=str(DEFAULT_BUNDLES_DIR), help="Directory holding bundle versions")
+
+    verify = subparsers.add_parser("verify", help="Check a bundle against its manifest")
+    verify.add_argument("path", help="Bundle directory")
+
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        bundle = ModelBundle(Path(args.path))
+        bundle.verify()
+        print(f"✅ Bundle {bundle.version} OK ({len(bundle.manifest['files'])} files)")
+        return
+
+    from app.services.ml_service import MLPredictionService
+
+    service = MLPredictionService()
+    weights = args.weights or service._download_weights()
+    bundle_dir = build_bundle(
+        args.version,
+        Path(weights),
+        output_dir=Path(args.output),
+        model_repo_id=service.MODEL_REPO_ID
+    )
+    print(f"📦 Bundle written to {bundle_dir}")
+    print(f"   Serve it with ML_BUNDLE_DIR={bundle_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Fast PhoBERT Tokenizer
+Rust-backed (HF `tokenizers`) equivalent of the slow Python PhobertTokenizer,
+built from the bundled vocab.txt / bpe.codes.
+
+PhoBERT uses subword-nmt style BPE: every piece of a word except the last
+carries a "@@" suffix. `tokenizers` BPE only supports an end-of-word suffix,
+so the model runs on an internal vocabulary where
+    "xy@@" (non-final piece)  -> "xy"
+    "xyz"  (final piece)      -> "xyz</w>"
+and both map to the PhoBERT ids. Intermediate merge results that PhoBERT
+does not know get "shadow" ids above the real vocabulary (`tokenizers`
+needs one id per token); they are mapped back to <unk> after encoding,
+exactly as the slow tokenizer maps unknown pieces.
+"""
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from tokenizers import Tokenizer, models, pre_tokenizers, processors
+from transformers import PreTrainedTokenizerFast
+
+SPECIAL_TOKENS = ["<s>", "<pad>", "</s>", "<unk>"]
+END_OF_WORD = "</w>"
+CONTINUATION = "@@"
+
+# Vietnamese text used to check the fast tokenizer against the slow one
+PARITY_CORPUS = [
+    "Sản_phẩm rất tốt , chất_lượng cao , đóng_gói cẩn_thận .",
+    "Chất_lượng kém , không như mô_tả . Rất thất_vọng .",
+    "Giao hàng nhanh , sản_phẩm ổn , giá_cả hợp_lý .",
+    "Hàng giả , dùng 2 ngày đã hỏng 😡😡 !!!",
+    "Shop tư_vấn nhiệt_tình , 10/10 sẽ ủng_hộ tiếp ❤️",
+    "Áo mặc hơi chật , màu không giống hình , size XL mà như size M",
+    "đóng gói ẩu , hộp bị móp méo , thiếu phụ kiện",
+    "ok",
+    "Điện_thoại dùng mượt , pin trâu , camera chụp đẹp , đáng đồng_tiền bát_gạo",
+    "ship chậm quá , 2 tuần mới nhận đc hàng :(((",
+]
+
+
+def _load_vocab(vocab_file: Path) -> Dict[str, int]:
+    """PhoBERT ids: special tokens first, then vocab.txt order (as PhobertTokenizer)"""
+    encoder = {token: i for i, token in enumerate(SPECIAL_TOKENS)}
+    with open(vocab_file, encoding="utf-8") as f:
+        for line in f:
+            # Same parsing as PhobertTokenizer.add_from_file
+            line = line.strip()
+            if not line:
+                continue
+            encoder[line[:line.rfind(" ")]] = len(encoder)
+    encoder.setdefault("<mask>", len(encoder))
+    return encoder
+
+
+def _load_merges(merges_file: Path) -> List[Tuple[str, str]]:
+    # Same parsing as PhobertTokenizer; lines that do not split into a pair
+    # (e.g. ones containing a no-break space) can never match there either
+    with open(merges_file, encoding="utf-8") as f:
+        merges = [tuple(line.split()[:-1]) for line in f if line.strip()]
+    return [merge for merge in merges if len(merge) == 2]
+
+
+def _internal_token(piece: str) -> str:
+    """PhoBERT token for a piece in the internal (end-of-word suffix) form"""
+    if piece.endswith(END_OF_WORD):
+        return piece[:-len(END_OF_WORD)]
+    return piece + CONTINUATION
+
+
+def build_tokenizer_object(vocab_file: Path, merges_file: Path) -> Tuple[Tokenizer, int]:
+    """
+    Rust tokenizer producing the same input_ids as PhobertTokenizer
+    (after shadow ids are mapped to <unk>). Returns (tokenizer, first shadow id).
+    """
+    encoder = _load_vocab(vocab_file)
+    merges = _load_merges(merges_file)
+
+    # Every string the BPE can produce must exist in the model vocabulary
+    pieces = set()
+    for token in encoder:
+        if token in SPECIAL_TOKENS or token == "<mask>":
+            continue
+        if token.endswith(CONTINUATION):
+            pieces.add(token[:-len(CONTINUATION)])
+        else:
+            pieces.add(token + END_OF_WORD)
+    for left, right in merges:
+        pieces.update((left, right, left + right))
+    for piece in list(pieces):
+        for char in piece.replace(END_OF_WORD, ""):
+            pieces.update((char, char + END_OF_WORD))
+    pieces.discard("")
+
+    vocab = {token: encoder[token] for token in SPECIAL_TOKENS + ["<mask>"]}
+    first_shadow_id = max(encoder.values()) + 1
+    next_shadow_id = first_shadow_id
+    for piece in sorted(pieces):
+        token_id = encoder.get(_internal_token(piece))
+        if token_id is None:
+            token_id = next_shadow_id
+            next_shadow_id += 1
+        vocab[piece] = token_id
+
+    tokenizer = Tokenizer(models.BPE(
+        vocab=vocab,
+        merges=merges,
+        unk_token="<unk>",
+        end_of_word_suffix=END_OF_WORD
+    ))
+    tokenizer.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="<s> $A </s>",
+        pair="<s> $A </s> </s> $B </s>",
+        special_tokens=[("<s>", encoder["<s>"]), ("</s>", encoder["</s>"])]
+    )
+    tokenizer.add_special_tokens(SPECIAL_TOKENS + ["<mask>"])
+    return tokenizer, first_shadow_id
+
+
+class PhobertTokenizerFast(PreTrainedTokenizerFast):
+    """PreTrainedTokenizerFast that reports tokens in PhoBERT form ("xy@@", "xyz")"""
+
+    model_input_names = ["input_ids", "attention_mask"]
+    # Ids at or above this are pieces PhoBERT does not know (see module docstring)
+    first_shadow_id: Optional[int] = None
+
+    def _convert_encoding(self, encoding, *args, **kwargs):
+        encoding_dict, encodings = super()._convert_encoding(encoding, *args, **kwargs)
+        if self.first_shadow_id is not None:
+            limit, unk_id = self.first_shadow_id, self.unk_token_id
+            encoding_dict["input_ids"] = [
+                [i if i < limit else unk_id for i in ids]
+                for ids in encoding_dict["input_ids"]
+            ]
+        return encoding_dict, encodings
+
+    def convert_ids_to_tokens(self, ids: Union[int, List[int]], skip_special_tokens: bool = False):
+        tokens = super().convert_ids_to_tokens(ids, skip_special_tokens=skip_special_tokens)
+        if isinstance(tokens, str):
+            return self._to_phobert_form(tokens)
+        return [self._to_phobert_form(token) for token in tokens]
+
+    @staticmethod
+    def _to_phobert_form(token: str) -> str:
+        if token in SPECIAL_TOKENS or token == "<mask>":
+            return token
+        if token.endswith(END_OF_WORD):
+            return token[:-len(END_OF_WORD)]
+        return token + CONTINUATION
+
+
+def load_fast_tokenizer(tokenizer_dir: Path) -> PhobertTokenizerFast:
+    """Build the fast tokenizer from a PhoBERT tokenizer directory"""
+    tokenizer_dir = Path(tokenizer_dir)
+    tokenizer_object, first_shadow_id = build_tokenizer_object(
+        tokenizer_dir / "vocab.txt", tokenizer_dir / "bpe.codes"
+    )
+    tokenizer = PhobertTokenizerFast(
+        tokenizer_object=tokenizer_object,
+        bos_token="<s>",
+        eos_token="</s>",
+        unk_token="<unk>",
+        sep_token="</s>",
+        cls_token="<s>",
+        pad_token="<pad>",
+        mask_token="<mask>"
+    )
+    tokenizer.first_shadow_id = first_shadow_id
+    return tokenizer
+
+
+def find_mismatches(fast, slow, texts: List[str], max_length: int = 256) -> List[str]:
+    """Texts whose input_ids differ between the two tokenizers"""
+    fast_ids = fast(texts, truncation=True, max_length=max_length)["input_ids"]
+    slow_ids = slow(texts, truncation=True, max_length=max_length)["input_ids"]
+    return [text for text, a, b in zip(texts, fast_ids, slow_ids) if a != b]
@@ -0,0 +1,283 @@
+"""
+Prediction Cache
+Content-addressed LRU cache for model predictions,
+with an optional SQLite backend shared across workers and restarts
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Tuple
+
+from app.config import (
+    ML_CACHE_SIZE,
+    ML_CACHE_TTL,
+    ML_PERSISTENT_CACHE,
+    ML_PERSISTENT_CACHE_PATH,
+    ML_PERSISTENT_CACHE_MAX_ENTRIES
+)
+
+
+def normalize_comment(text: str) -> str:
+    """Normalize a comment so trivially different copies share a cache entry"""
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def comment_key(text: str, model_version: str) -> str:
+    """Hash of the normalized comment plus the model that scored it"""
+    payload = f"{model_version}\0{normalize_comment(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PersistentCacheBackend:
+    """
+    SQLite key/value store for predictions.
+    WAL mode lets several uvicorn workers read while one writes; rows over
+    max_entries are compacted away (oldest first) every `compact_every` writes.
+    Rows of other model versions are dropped when a process first writes
+    under a new one, so entries do not outlive a model upgrade.
+    """
+
+    def __init__(
+        self,
+        path: Path = ML_PERSISTENT_CACHE_PATH,
+        max_entries: int = ML_PERSISTENT_CACHE_MAX_ENTRIES,
+        ttl: float = ML_CACHE_TTL,
+        compact_every: int = 1000
+    ):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.compact_every = compact_every
+        self._local = threading.local()
+        self._writes_since_compact = 0
+        self._model: Optional[str] = None
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._enable_incremental_vacuum()
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS predictions (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                rating INTEGER NOT NULL,
+                confidence REAL NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_predictions_created_at ON predictions (created_at)")
+
+    def _enable_incremental_vacuum(self):
+        """
+        auto_vacuum only takes effect if set before the file gets its first
+        table, and before WAL mode is switched on; a file created without it
+        is rebuilt once with VACUUM so compact() can release pages
+        """
+        conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                conn.execute("VACUUM")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections are not thread-safe)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch all non-expired entries among keys"""
+        found: Dict[str, Dict[str, Any]] = {}
+        if not keys:
+            return found
+        min_created = time.time() - self.ttl if self.ttl > 0 else 0
+        conn = self._connect()
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT key, rating, confidence FROM predictions "
+                f"WHERE key IN ({placeholders}) AND created_at >= ?",
+                (*chunk, min_created)
+            ).fetchall()
+            for key, rating, confidence in rows:
+                found[key] = {'rating': rating, 'confidence': confidence}
+        return found
+
+    def put_many(self, model: str, items: List[Tuple[str, Dict[str, Any]]]):
+        """Insert or refresh entries in one transaction"""
+        if not items:
+            return
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if model != self._model:
+                conn.execute("DELETE FROM predictions WHERE model != ?", (model,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO predictions (key, model, rating, confidence, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(key, model, value['rating'], value['confidence'], now) for key, value in items]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._model = model
+
+        self._writes_since_compact += len(items)
+        if self._writes_since_compact >= self.compact_every:
+            self._writes_since_compact = 0
+            self.compact()
+
+    def compact(self):
+        """Drop expired rows, trim to 90% of max_entries and release free pages"""
+        conn = self._connect()
+        if self.ttl > 0:
+            conn.execute("DELETE FROM predictions WHERE created_at < ?", (time.time() - self.ttl,))
+        count = conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        if count > self.max_entries:
+            excess = count - int(self.max_entries * 0.9)
+            conn.execute(
+                "DELETE FROM predictions WHERE key IN "
+                "(SELECT key FROM predictions ORDER BY created_at LIMIT ?)",
+                (excess,)
+            )
+        # execute() steps the pragma once (one page); executescript runs it to completion
+        conn.executescript("PRAGMA incremental_vacuum;")
+
+    def clear(self):
+        self._connect().execute("DELETE FROM predictions")
+
+    def count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+
+class PredictionCache:
+    """
+    In-process LRU cache with TTL.
+    Values are small prediction dicts ({'rating', 'confidence'}).
+    If a persistent backend is given, it is consulted on memory misses and
+    written through on every put.
+    """
+
+    def __init__(
+        self,
+        max_size: int = ML_CACHE_SIZE,
+        ttl: float = ML_CACHE_TTL,
+        backend: Optional[PersistentCacheBackend] = None
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.backend = backend
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 or self.backend is not None
+
+    def _get_local(self, key: str) -> Optional[Dict[str, Any]]:
+        """Memory lookup; caller holds the lock"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if self.ttl <= 0 or time.monotonic() - stored_at < self.ttl:
+            self._entries.move_to_end(key)
+            return dict(value)
+        del self._entries[key]
+        return None
+
+    def _put_local(self, key: str, value: Dict[str, Any]):
+        """Memory insert with LRU eviction; caller holds the lock"""
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (time.monotonic(), dict(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return cached value or None (expired entries count as misses)"""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Look up several keys; memory first, then the persistent backend"""
+        if not self.enabled:
+            return {}
+        found: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        with self._lock:
+            for key in keys:
+                value = self._get_local(key)
+                if value is not None:
+                    found[key] = value
+                else:
+                    missing.append(key)
+
+        if missing and self.backend is not None:
+            from_backend = self.backend.get_many(missing)
+            with self._lock:
+                for key, value in from_backend.items():
+                    self._put_local(key, value)
+            found.update(from_backend)
+
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put(self, key: str, value: Dict[str, Any], model: str = ""):
+        """Store value, evicting least recently used entries over max_size"""
+        self.put_many([(key, value)], model)
+
+    def put_many(self, items: List[Tuple[str, Dict[str, Any]]], model: str = ""):
+        """Store several values (one backend transaction)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            for key, value in items:
+                self._put_local(key, value)
+        if self.backend is not None:
+            self.backend.put_many(model, items)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'persistent': self.backend is not None
+        }
+
+
+def create_prediction_cache() -> PredictionCache:
+    """Build the cache configured by ML_CACHE_* / ML_PERSISTENT_CACHE_* settings"""
+    backend = PersistentCacheBackend() if ML_PERSISTENT_CACHE else None
+    return PredictionCache(backend=backend)
@@ -0,0 +1,107 @@
+"""
+Vietnamese Word Segmentation
+Memoized underthesea segmentation with an optional process pool for batches.
+
+Kept free of app imports so pool workers start quickly.
+"""
+import atexit
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional
+
+_word_tokenize = None
+
+
+def segment_text(text: str) -> str:
+    """Segment one comment (underthesea is imported once per process)"""
+    global _word_tokenize
+    if _word_tokenize is None:
+        from underthesea import word_tokenize
+        _word_tokenize = word_tokenize
+    return _word_tokenize(text, format="text")
+
+
+class VietnameseSegmenter:
+    """
+    CRF word segmentation with an LRU memo of recent results.
+    Batches with at least `parallel_min` uncached texts are split across
+    `workers` processes (0 or 1 = always in-process).
+    """
+
+    def __init__(self, cache_size: int = 50000, workers: int = 0, parallel_min: int = 200):
+        self.cache_size = cache_size
+        self.workers = workers
+        self.parallel_min = parallel_min
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+        # Timing / counters
+        self.texts_segmented = 0
+        self.cache_hits = 0
+        self.seconds = 0.0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn, not fork: the parent may already run torch threads
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                atexit.register(self._pool.shutdown, wait=False, cancel_futures=True)
+            return self._pool
+
+    def _remember(self, text: str, segmented: str):
+        """LRU insert; caller holds the lock"""
+        if self.cache_size <= 0:
+            return
+        self._cache[text] = segmented
+        self._cache.move_to_end(text)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def segment(self, text: str) -> str:
+        return self.segment_batch([text])[0]
+
+    def segment_batch(self, texts: List[str]) -> List[str]:
+        """Segment texts (order preserved), reusing memoized results"""
+        started = time.perf_counter()
+        results: Dict[str, str] = {}
+        with self._lock:
+            for text in texts:
+                if text in self._cache and text not in results:
+                    self._cache.move_to_end(text)
+                    results[text] = self._cache[text]
+        hits = len(results)
+        missing = [text for text in dict.fromkeys(texts) if text not in results]
+
+        if missing:
+            if self.workers > 1 and len(missing) >= self.parallel_min:
+                chunksize = max(1, len(missing) // (self.workers * 4))
+                segmented = list(self._get_pool().map(segment_text, missing, chunksize=chunksize))
+            else:
+                segmented = [segment_text(text) for text in missing]
+            with self._lock:
+                for text, value in zip(missing, segmented):
+                    results[text] = value
+                    self._remember(text, value)
+
+        with self._lock:
+            self.texts_segmented += len(missing)
+            self.cache_hits += hits
+            self.seconds += time.perf_counter() - started
+        return [results[text] for text in texts]
+
+    def stats(self) -> Dict[str, Any]:
+        """Cumulative timing and memo counters"""
+        return {
+            'texts_segmented': self.texts_segmented,
+            'cache_hits': self.cache_hits,
+            'cache_size': len(self._cache),
+            'seconds': round(self.seconds, 3),
+            'workers': self.workers
+        }
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark: token-importance scoring in predict_with_explanation
+
+Compares the former per-token scan over both keyword lists with the
+precomputed polarity lookup (MLPredictionService._token_importance) on
+256-token inputs from the bundled PhoBERT tokenizer. No model is loaded;
+the scores of both versions are checked to be identical.
+
+Usage:
+    python benchmarks/benchmark_explanation.py [--csv sample_comments.csv] [--repeat 200]
+"""
+import argparse
+import csv
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def legacy_importance(tokens, predicted_class, positive_words, negative_words):
+    """Scoring as it was before the lookup (any() scans per token)"""
+    word_importance = []
+    for i, token in enumerate(tokens):
+        if token not in ['<s>', '</s>', '<pad>', '<unk>']:
+            clean_token = token.replace('@@', '').replace('▁', '').strip()
+            if not clean_token:
+                continue
+            is_positive = any(kw in clean_token.lower() or clean_token.lower() in kw for kw in positive_words)
+            is_negative = any(kw in clean_token.lower() or clean_token.lower() in kw for kw in negative_words)
+            if is_positive:
+                score = 0.8 + (0.2 * (1 - i / len(tokens)))
+            elif is_negative:
+                score = -(0.8 + (0.2 * (1 - i / len(tokens))))
+            else:
+                score = 0.2 if predicted_class >= 2 else -0.2
+            word_importance.append({'word': clean_token, 'score': round(score, 3)})
+    return word_importance
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=str(ROOT / "sample_comments.csv"), help="CSV with a 'Comment' column")
+    parser.add_argument("--repeat", type=int, default=200, help="Scoring calls per input")
+    parser.add_argument("--max-length", type=int, default=256)
+    args = parser.parse_args()
+
+    from transformers import AutoTokenizer
+    from app.services.ml_service import MLPredictionService
+    from app.services.model_bundle import DEFAULT_TOKENIZER_DIR
+
+    with open(args.csv, encoding="utf-8-sig") as f:
+        comments = [row["Comment"].strip() for row in csv.DictReader(f) if row.get("Comment", "").strip()]
+
+    # One long input per rotation of the comments, truncated to max_length tokens
+    tokenizer = AutoTokenizer.from_pretrained(DEFAULT_TOKENIZER_DIR, use_fast=False)
+    inputs = []
+    for offset in range(min(len(comments), 8)):
+        text = " ".join(comments[offset:] + comments[:offset])
+        ids = tokenizer(text, truncation=True, max_length=args.max_length)["input_ids"]
+        inputs.append(tokenizer.convert_ids_to_tokens(ids))
+
+    service = MLPredictionService()
+    analyzer = service.keyword_analyzer
+
+    for tokens in inputs:
+        legacy = legacy_importance(tokens, 3, analyzer.positive_words, analyzer.negative_words)
+        current = service._token_importance(tokens, 3)
+        assert [w['word'] for w in legacy] == current['words']
+        assert [w['score'] for w in legacy] == current['scores']
+
+    started = time.perf_counter()
+    for tokens in inputs:
+        for _ in range(args.repeat):
+            legacy_importance(tokens, 3, analyzer.positive_words, analyzer.negative_words)
+    legacy_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for tokens in inputs:
+        for _ in range(args.repeat):
+            service._token_importance(tokens, 3)
+    lookup_seconds = time.perf_counter() - started
+
+    calls = len(inputs) * args.repeat
+    print(f"Inputs: {len(inputs)} x {len(inputs[0])} tokens, {args.repeat} calls each")
+    print(f"legacy scan:   {legacy_seconds / calls * 1e6:8.1f} µs/call")
+    print(f"lookup:        {lookup_seconds / calls * 1e6:8.1f} µs/call")
+    print(f"✅ identical scores, {legacy_seconds / max(lookup_seconds, 1e-9):.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
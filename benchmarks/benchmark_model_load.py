@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cold model load, pretrained build vs config-only fast load
+
+Each mode runs in a fresh subprocess (model artifacts are expected to be in
+the local Hugging Face cache already) and reports wall time of
+MLPredictionService._load_model and the process's peak RSS. The torch /
+transformers import (the same in both modes) is timed separately; cold
+start is import + load.
+
+Usage:
+    python benchmarks/benchmark_model_load.py [--runs 3]
+"""
+import argparse
+import importlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+MODES = {
+    "pretrained": {"ML_FAST_LOAD": "false"},
+    "fast_load": {"ML_FAST_LOAD": "true"},
+}
+HEAVY_IMPORTS = ("torch", "transformers.models.auto.tokenization_auto", "transformers.models.roberta.modeling_roberta")
+METRICS = ("import_seconds", "load_seconds", "cold_start_seconds", "peak_rss_mb", "load_peak_delta_mb")
+
+
+def measure_once() -> dict:
+    """Load the model in this process and return timing + peak memory"""
+    from app.services.ml_service import MLPredictionService
+
+    started = time.perf_counter()
+    for module in HEAVY_IMPORTS:
+        importlib.import_module(module)
+    import_seconds = time.perf_counter() - started
+
+    service = MLPredictionService()
+    baseline_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    started = time.perf_counter()
+    service._load_model()
+    seconds = time.perf_counter() - started
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        "import_seconds": round(import_seconds, 2),
+        "load_seconds": round(seconds, 2),
+        "cold_start_seconds": round(import_seconds + seconds, 2),
+        "peak_rss_mb": round(peak_mb, 1),
+        "load_peak_delta_mb": round(peak_mb - baseline_mb, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Cold loads per mode (best is reported)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_once()))
+        return
+
+    results = {}
+    for mode, overrides in MODES.items():
+        env = {**os.environ, **overrides}
+        runs = []
+        for _ in range(args.runs):
+            out = subprocess.run(
+                [sys.executable, __file__, "--child"],
+                capture_output=True, text=True, check=True, cwd=ROOT, env=env
+            ).stdout
+            runs.append(json.loads(out.strip().splitlines()[-1]))
+        results[mode] = {
+            key: min(run[key] for run in runs)
+            for key in METRICS
+        }
+
+    before, after = results["pretrained"], results["fast_load"]
+    print(f"\n{'metric':<22}{'pretrained':>12}{'fast_load':>12}")
+    for key in METRICS:
+        print(f"{key:<22}{before[key]:>12}{after[key]:>12}")
+    print(f"\nModel load: {before['load_seconds'] / max(after['load_seconds'], 1e-6):.2f}x faster, "
+          f"cold start: {before['cold_start_seconds'] / max(after['cold_start_seconds'], 1e-6):.2f}x faster, "
+          f"peak RSS {before['peak_rss_mb'] - after['peak_rss_mb']:.0f} MB lower")
+
+
+if __name__ == "__main__":
+    main()
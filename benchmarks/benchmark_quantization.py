@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark: fp32 vs dynamic int8 PhoBERT inference on CPU
+
+Each variant runs in its own subprocess so memory numbers are not mixed.
+Reports load time, resident memory, per-comment and batch latency, and how
+often the int8 model agrees with fp32 on the predicted rating.
+
+Usage:
+    python benchmarks/benchmark_quantization.py [--csv sample_comments.csv] [--repeat 3]
+"""
+import argparse
+import csv
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+HEAVY_IMPORTS = ("torch", "transformers.models.auto.tokenization_auto", "transformers.models.roberta.modeling_roberta")
+
+
+def rss_mb() -> float:
+    """Current resident set size in MB (Linux /proc, falls back to peak RSS)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def load_comments(path: Path):
+    with open(path, encoding="utf-8-sig") as f:
+        return [row["Comment"].strip() for row in csv.DictReader(f) if row.get("Comment", "").strip()]
+
+
+def run_variant(quantize: bool, csv_path: Path, repeat: int) -> dict:
+    """Measure one variant in this process and return the numbers"""
+    os.environ["ML_CACHE_SIZE"] = "0"
+    os.environ["ML_PERSISTENT_CACHE"] = "false"
+    from app.services.ml_service import MLPredictionService
+
+    comments = load_comments(csv_path)
+    service = MLPredictionService(quantize=quantize)
+
+    # Import torch/transformers first so model_rss_mb only counts the model
+    for module in HEAVY_IMPORTS:
+        importlib.import_module(module)
+
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    service._load_model()
+    load_seconds = time.perf_counter() - started
+    rss_after = rss_mb()
+
+    # Preprocessing is identical for both variants; keep it out of the timings
+    processed = [service.preprocess(c) for c in comments]
+    service._infer_batch(processed[:1])
+
+    single = []
+    for _ in range(repeat):
+        for text in processed:
+            t0 = time.perf_counter()
+            service._infer_batch([text])
+            single.append(time.perf_counter() - t0)
+
+    batch = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        ratings = [p["rating"] for p in service._infer_batch(processed)]
+        batch.append(time.perf_counter() - t0)
+
+    single.sort()
+    return {
+        "variant": "int8" if quantize else "fp32",
+        "load_seconds": round(load_seconds, 2),
+        "model_rss_mb": round(rss_after - rss_before, 1),
+        "total_rss_mb": round(rss_after, 1),
+        "single_p50_ms": round(single[len(single) // 2] * 1000, 2),
+        "single_p95_ms": round(single[int(len(single) * 0.95) - 1] * 1000, 2),
+        "batch_ms": round(min(batch) * 1000, 2),
+        "rows": len(comments),
+        "ratings": ratings,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=str(ROOT / "sample_comments.csv"), help="CSV with a 'Comment' column")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions")
+    parser.add_argument("--variant", choices=["fp32", "int8"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant == "int8", Path(args.csv), args.repeat)))
+        return
+
+    results = {}
+    for variant in ("fp32", "int8"):
+        out = subprocess.run(
+            [sys.executable, __file__, "--variant", variant, "--csv", args.csv, "--repeat", str(args.repeat)],
+            capture_output=True, text=True, check=True, cwd=ROOT
+        ).stdout
+        results[variant] = json.loads(out.strip().splitlines()[-1])
+
+    fp32, int8 = results["fp32"], results["int8"]
+    agreement = sum(a == b for a, b in zip(fp32["ratings"], int8["ratings"])) / max(len(fp32["ratings"]), 1)
+
+    print(f"\nRows: {fp32['rows']}  (repeat={args.repeat})\n")
+    print(f"{'metric':<18}{'fp32':>12}{'int8':>12}")
+    for key in ("load_seconds", "model_rss_mb", "total_rss_mb", "single_p50_ms", "single_p95_ms", "batch_ms"):
+        print(f"{key:<18}{fp32[key]:>12}{int8[key]:>12}")
+    print(f"\nRating agreement int8 vs fp32: {agreement:.1%}")
+    print(f"Batch speed-up: {fp32['batch_ms'] / int8['batch_ms']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Parity check: fast (Rust) PhoBERT tokenizer vs the slow Python tokenizer
+
+Encodes a Vietnamese corpus with both tokenizers and asserts identical
+input_ids (with the same truncation as inference). Also reports the
+encoding speed-up. Exits with status 1 on any mismatch.
+
+Corpus: built-in samples + every 'Comment' in the given CSV files, both raw
+and (if underthesea is installed) word-segmented like MLPredictionService.
+
+Usage:
+    python benchmarks/check_tokenizer_parity.py [--csv sample_comments.csv ...] [--slow-from-hub]
+"""
+import argparse
+import csv
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def load_comments(paths):
+    comments = []
+    for path in paths:
+        with open(path, encoding="utf-8-sig") as f:
+            comments.extend(row["Comment"].strip() for row in csv.DictReader(f) if row.get("Comment", "").strip())
+    return comments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", nargs="*", default=[str(ROOT / "sample_comments.csv")], help="CSV files with a 'Comment' column")
+    parser.add_argument("--slow-from-hub", action="store_true", help="Compare against vinai/phobert-base instead of the bundled files")
+    parser.add_argument("--max-length", type=int, default=256)
+    args = parser.parse_args()
+
+    from transformers import AutoTokenizer
+    from app.services.model_bundle import DEFAULT_TOKENIZER_DIR
+    from app.services.phobert_fast_tokenizer import load_fast_tokenizer, find_mismatches, PARITY_CORPUS
+
+    slow_source = "vinai/phobert-base" if args.slow_from_hub else DEFAULT_TOKENIZER_DIR
+    slow = AutoTokenizer.from_pretrained(slow_source, use_fast=False)
+    fast = load_fast_tokenizer(DEFAULT_TOKENIZER_DIR)
+
+    corpus = PARITY_CORPUS + load_comments(args.csv)
+    try:
+        from underthesea import word_tokenize
+        corpus += [word_tokenize(text, format="text") for text in corpus]
+    except ImportError:
+        print("ℹ️ underthesea not installed, checking raw text only")
+
+    mismatches = find_mismatches(fast, slow, corpus, args.max_length)
+
+    started = time.perf_counter()
+    slow(corpus, truncation=True, max_length=args.max_length)
+    slow_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    fast(corpus, truncation=True, max_length=args.max_length)
+    fast_seconds = time.perf_counter() - started
+
+    print(f"Texts checked: {len(corpus)}")
+    print(f"Encode time: slow {slow_seconds * 1000:.1f} ms, fast {fast_seconds * 1000:.1f} ms "
+          f"({slow_seconds / max(fast_seconds, 1e-9):.1f}x)")
+
+    if mismatches:
+        print(f"❌ {len(mismatches)} mismatching text(s):")
+        for text in mismatches[:10]:
+            print(f"   {text!r}")
+        sys.exit(1)
+    print("✅ input_ids identical for all texts")
+
+
+if __name__ == "__main__":
+    main()
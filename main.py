@@ -3,20 +3,26 @@ Main FastAPI Application
 Sentiment Rating Prediction System
 """
 import os
+import threading
 
 # OPTIONAL: Set HuggingFace cache directory (only for local dev)
 # Comment this out for production to use default cache
 # if not os.getenv("RENDER"):  # Only for local development
 #     os.environ['HF_HOME'] = 'G:/huggingface_cache'
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
 from app.database import engine, Base
+from app.migrations import run_migrations
 from app.routers import auth, prediction, dashboard
+from app.config import ML_EAGER_LOAD, ML_PRELOAD_MODEL
+from app.services.ml_service import get_ml_service, ModelLoadError
+from app.services.batch_jobs import get_batch_job_manager
 
 # ============================================
 # DATABASE AUTO-MIGRATION
@@ -25,6 +31,7 @@ from app.routers import auth, prediction, dashboard
 # Critical for PostgreSQL on Render (no manual migrations needed)
 print("🔄 Creating database tables...")
 Base.metadata.create_all(bind=engine)
+run_migrations()  # alter tables created by earlier versions
 print("✅ Database tables created successfully!")
 
 # ============================================
@@ -63,6 +70,74 @@ app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(prediction.router, prefix="/api/predict", tags=["Prediction"])
 app.include_router(dashboard.router, tags=["Dashboard"])
 
+# ============================================
+# MODEL LOAD FAILURES
+# ============================================
+# A failed load is retried on the next request, so tell clients to come back
+@app.exception_handler(ModelLoadError)
+async def model_load_error_handler(request: Request, exc: ModelLoadError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "30"}
+    )
+
+# ============================================
+# PRE-FORK MODEL LOADING (OPT-IN)
+# ============================================
+# Run with: gunicorn main:app --preload -k uvicorn.workers.UvicornWorker -w 4
+# The master process loads the model here, then forks; workers inherit the
+# weights copy-on-write instead of each loading ~1GB.
+# (uvicorn --workers spawns fresh interpreters, so use ML_MMAP_WEIGHTS there.)
+# No forward pass here: starting torch's thread pool before fork can deadlock workers.
+if ML_PRELOAD_MODEL:
+    get_ml_service()._load_model()
+
+# ============================================
+# MODEL WARM-UP
+# ============================================
+# With ML_EAGER_LOAD=true the model is downloaded, loaded and warmed up in a
+# background thread at boot, so the first user does not pay the cold start.
+# Otherwise the first /ready probe starts it (a pod must become ready
+# without traffic). The server accepts requests meanwhile; /ready reports
+# progress, and a failed warm-up is retried by the next probe.
+_warmup_thread = None
+_warmup_lock = threading.Lock()
+
+def start_model_warmup_thread():
+    """Start the background warm-up unless one is already running"""
+    global _warmup_thread
+
+    def _warm_up():
+        try:
+            get_ml_service().warm_up()
+        except Exception as e:
+            print(f"❌ Model warm-up failed: {e}")
+
+    with _warmup_lock:
+        if _warmup_thread is not None and _warmup_thread.is_alive():
+            return
+        _warmup_thread = threading.Thread(target=_warm_up, name="model-warmup", daemon=True)
+        _warmup_thread.start()
+
+@app.on_event("startup")
+async def start_model_warmup():
+    if ML_EAGER_LOAD:
+        start_model_warmup_thread()
+
+# ============================================
+# BATCH JOB WORKERS
+# ============================================
+# Queued CSV jobs (/api/predict/jobs) are processed in background threads;
+# jobs left running by a previous process are picked up again.
+@app.on_event("startup")
+async def start_batch_job_workers():
+    get_batch_job_manager().start()
+
+@app.on_event("shutdown")
+async def stop_batch_job_workers():
+    get_batch_job_manager().stop()
+
 # ============================================
 # ROOT & HEALTH CHECK ENDPOINTS
 # ============================================
@@ -72,7 +147,8 @@ async def root():
     return {
         "message": "Vietnamese Product Rating Prediction API",
         "docs": "/docs",
-        "health": "/health"
+        "health": "/health",
+        "ready": "/ready"
     }
 
 @app.get("/health")
@@ -84,6 +160,17 @@ async def health_check():
         "version": "1.0.0"
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 once the model can serve, 503 with progress while loading"""
+    model_status = get_ml_service().status()
+    if not model_status["ready"]:
+        start_model_warmup_thread()
+    return JSONResponse(
+        status_code=200 if model_status["ready"] else 503,
+        content=model_status
+    )
+
 # ============================================
 # LOCAL DEVELOPMENT SERVER
 # ============================================
@@ -0,0 +1,50 @@
+"""Streaming batch predictions (/api/predict/batch/stream)"""
+import asyncio
+import io
+import json
+
+from fastapi import UploadFile
+
+from app.config import ML_STREAM_FIRST_CHUNK_ROWS
+from app.database import SessionLocal
+from app.models import User, PredictionBatch, PredictionHistory
+from app.routers.prediction import predict_batch_stream
+from app.services.inference_executor import get_inference_executor
+
+
+def _csv(rows: int) -> bytes:
+    lines = ["Comment"] + [f"Sản phẩm số {i} dùng rất tốt" for i in range(rows)]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def test_client_disconnect_keeps_batch_stats(client, fake_ml_service):
+    db = SessionLocal()
+    user = User(username="stream_user", email="stream@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+
+    async def read_first_chunk_then_disconnect():
+        response = await predict_batch_stream(
+            product_name="Phone",
+            format="ndjson",
+            file=UploadFile(io.BytesIO(_csv(ML_STREAM_FIRST_CHUNK_ROWS + 20)), filename="reviews.csv"),
+            current_user=user,
+            ml_service=fake_ml_service,
+            executor=get_inference_executor()
+        )
+        body = response.body_iterator
+        first = json.loads(await body.__anext__())
+        await body.aclose()
+        return first
+
+    first = asyncio.run(read_first_chunk_then_disconnect())
+    assert first["event"] == "predictions"
+    assert len(first["rows"]) == ML_STREAM_FIRST_CHUNK_ROWS
+
+    db.expire_all()
+    batch = db.query(PredictionBatch).filter(PredictionBatch.user_id == user.id).one()
+    rows = db.query(PredictionHistory).filter(PredictionHistory.batch_id == batch.id).count()
+    assert batch.row_count == rows == ML_STREAM_FIRST_CHUNK_ROWS
+    assert batch.average_rating == 4
+    assert json.loads(batch.rating_distribution)["4"] == ML_STREAM_FIRST_CHUNK_ROWS
+    db.close()
@@ -0,0 +1,16 @@
+"""Prediction history endpoints"""
+
+
+def test_history_with_null_product_name(client, auth_headers):
+    response = client.post("/api/predict/single", headers=auth_headers, json={
+        "product_name": None,
+        "comment": "Sản phẩm rất tốt, giao hàng nhanh"
+    })
+    assert response.status_code == 200, response.text
+
+    response = client.get("/api/predict/history", headers=auth_headers)
+    assert response.status_code == 200, response.text
+    history = response.json()
+    assert len(history) == 1
+    assert history[0]["product_name"] == "Unknown Product"
+    assert history[0]["prediction_type"] == "single"
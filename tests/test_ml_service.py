@@ -0,0 +1,54 @@
+"""MLPredictionService state that needs no model"""
+import pytest
+
+from app.services import ml_service
+from app.services.ml_service import MLPredictionService
+
+
+@pytest.fixture
+def service():
+    return MLPredictionService()
+
+
+def test_weights_id_comes_from_the_downloaded_snapshot(service, monkeypatch, tmp_path):
+    cached = []
+    monkeypatch.setattr(ml_service, "try_to_load_from_cache", lambda *args, **kwargs: cached[0] if cached else None)
+    weights = tmp_path / "snapshots" / "0123456789abcdef" / service.MODEL_FILENAME
+    weights.parent.mkdir(parents=True)
+    weights.write_bytes(b"weights")
+    monkeypatch.setattr(ml_service, "hf_hub_download", lambda **kwargs: str(weights))
+
+    # Not in the HF cache yet: no id, no artifacts, no cache keys
+    assert service.weights_id is None
+    assert service.status()['model_version'] is None
+    assert service._quantized_model_path() is None
+
+    # Unknown is not memoized
+    cached.append(str(weights))
+    assert service.weights_id == "rev-0123456789ab"
+
+    service._weights_id = None
+    cached.clear()
+    service._download_weights()
+    assert service.weights_id == "rev-0123456789ab"
+    assert service._onnx_model_path().name == "best_phoBER.rev-0123456789ab.onnx"
+
+
+def test_weights_id_outside_the_hf_cache_is_a_content_hash(service, tmp_path):
+    weights = tmp_path / "best_phoBER.pth"
+    weights.write_bytes(b"weights")
+    assert service._checkpoint_id(str(weights)).startswith("sha-")
+
+
+def test_status_reports_cache_stats(service):
+    service.cache.put("seen", {'rating': 5, 'confidence': 0.9})
+    service.cache.get("seen")
+    service.cache.get("unseen")
+    service.explanation_cache.get("unseen")
+
+    status = service.status()
+    assert status['cache']['hits'] == 1
+    assert status['cache']['misses'] == 1
+    assert status['cache']['size'] == 1
+    assert status['explanation_cache']['misses'] == 1
+    assert status['explanation_cache']['max_size'] == service.explanation_cache.max_size
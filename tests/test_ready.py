@@ -0,0 +1,35 @@
+"""Readiness probe"""
+import threading
+
+import main
+
+
+class SlowLoadingService:
+    """Reports not ready until warm_up() has run"""
+
+    def __init__(self):
+        self.loaded = False
+        self.release = threading.Event()
+        self.warm_ups = 0
+
+    def warm_up(self):
+        self.warm_ups += 1
+        self.release.wait(timeout=10)
+        self.loaded = True
+
+    def status(self):
+        return {'ready': self.loaded, 'stage': 'loaded' if self.loaded else 'not_loaded'}
+
+
+def test_ready_starts_the_model_load_in_lazy_mode(client, monkeypatch):
+    service = SlowLoadingService()
+    monkeypatch.setattr(main, "get_ml_service", lambda: service)
+
+    # First probes start one background load and report progress
+    assert client.get("/ready").status_code == 503
+    assert client.get("/ready").status_code == 503
+
+    service.release.set()
+    main._warmup_thread.join(timeout=10)
+    assert client.get("/ready").status_code == 200
+    assert service.warm_ups == 1